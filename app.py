@@ -3,17 +3,20 @@ import os
 # Fix OpenMP runtime conflict before any imports that use OpenMP
 os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
 
-from flask import Flask, render_template, request, redirect, url_for, session
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify
 import time
 from flask_session import Session
 from flask_sqlalchemy import SQLAlchemy
 import uuid
 from dotenv import load_dotenv
 from datetime import timedelta
-from utility.file_processing import process_uploaded_file
-from utility.summary_processing import summarize_text
+from utility.file_processing import save_uploaded_file, iter_document_pages
+from utility.pipeline import run_document_pipeline
+from utility.summary_processing import summarize_text, build_citation_index, expand_citation_ids
 from utility.audio_processing import convert_text_to_audio
-from utility.gemini_image_summarize import gemini_image_summarize
+from utility.gemini_summarize_tool import gemini_answer
+from utility.vector_index import retrieve_pages, delete_document_index, save_citation_index, load_citations
+from utility.token_metrics import get_document_usage, get_total_usage
 load_dotenv()
 
 app = Flask(__name__)
@@ -49,12 +52,47 @@ Session(app)
 with app.app_context():
     db.create_all()
 
+_tts_engine = None
+
+def prewarm():
+    """
+    Initialise the Gemini models and TTS engine up front so the first
+    request of a worker does not pay for them. Meant to run once per worker after
+    fork (see gunicorn.conf.py) or before app.run() when PREWARM is set.
+    """
+    global _tts_engine
+    started = time.perf_counter()
+
+    # Import the modules that are otherwise loaded on the first request
+    import fitz  # noqa: F401
+    import faiss  # noqa: F401
+    from langchain_community.vectorstores import FAISS  # noqa: F401
+    from utility.gemini_summarize_tool import initialize_gemini as initialize_text_model
+    from utility.gemini_image_summarize import initialize_gemini as initialize_vision_model
+    from utility.audio_processing import initialize_tts
+
+    for initialize in (initialize_text_model, initialize_vision_model):
+        try:
+            initialize()
+        except Exception as e:
+            print(f"Prewarm: model initialization failed: {e}")
+
+    # pyttsx3.init() hands out the live engine again, so keeping a reference keeps it warm
+    try:
+        _tts_engine = initialize_tts()
+    except Exception as e:
+        print(f"Prewarm: TTS initialization failed: {e}")
+
+    print(f"Prewarm finished in {time.perf_counter() - started:.2f}s")
+
+def prewarm_enabled():
+    return os.getenv("PREWARM", "").lower() in ("1", "true", "yes")
+
 @app.route("/", methods=["GET", "POST"])
 def index():
     error = None
     summary = None
     audio_filename = None
-    references = {}
     session['user_id'] = str(uuid.uuid4())
     if request.method == "POST":
         try:
@@ -63,46 +101,56 @@ def index():
             if not file or file.filename == "":
                 error = "No file selected. Please upload a document."
                 return render_template("index.html", error=error)
+
+            # Identifies the persisted page index used for follow-up questions;
+            # the index of the session's previous document is no longer reachable
+            delete_document_index(session.get("doc_id"))
+            doc_id = str(uuid.uuid4())
+            session["doc_id"] = doc_id
                 
-            text_chunks, image_info, full_text, file_type, uploaded_filepath, references = process_uploaded_file(file)
+            uploaded_filepath, file_type = save_uploaded_file(file)
+            session["uploaded_filepath"] = uploaded_filepath
+
+            # Extraction streams pages into image analysis and page embedding,
+            # which run concurrently and are joined before the final summary
+            result = run_document_pipeline(
+                iter_document_pages(uploaded_filepath, file_type), app.static_folder, doc_id=doc_id
+            )
+            text_chunks = result["text_chunks"]
+            image_info = result["image_info"]
+            full_text = result["full_text"]
+            references = result["references"]
 
             # Store file paths in session for cleanup
-            session["uploaded_filepath"] = uploaded_filepath
             session["extracted_images"] = [img["path"] for img in image_info]
 
             if not full_text:
                 error = "Could not extract text from file. Please ensure it is a valid and non-empty document."
             else:
-                # Generate summaries for each extracted image using absolute file paths with page text context
-                image_full_paths = [os.path.join(app.static_folder, p) for p in session["extracted_images"]]
-                
-                # Create page text mapping for images
-                image_page_texts = []
-                for img_info in image_info:
-                    page_num = img_info["page"]
-                    # Get all text from this page
-                    page_text = "\n".join([chunk['text'] for chunk in text_chunks if chunk['page'] == page_num])
-                    image_page_texts.append(page_text)
-                
-                image_summaries = gemini_image_summarize(image_full_paths, image_page_texts)
+                image_summaries = result["image_summaries"]
                 print(f"\nImage summaries: {image_summaries}\n")
-                # Check for a global failure signal from the vision model
-                vision_failure_signal = None
-                if image_summaries and image_summaries[0].startswith("VISION_"):
-                    vision_failure_signal = image_summaries[0]
-                
-                # Build a mapping from page -> list of image summaries, only if vision didn't fail
+
+                # Build a mapping from page -> list of image summaries.
+                # Images skipped by the vision budget have no summary and are left out.
                 page_image_summary_map = {}
-                if not vision_failure_signal:
-                    for info, img_sum in zip(image_info, image_summaries):
-                        p = info["page"]
-                        page_image_summary_map.setdefault(p, []).append(img_sum)
+                for info, img_sum in zip(image_info, image_summaries):
+                    if img_sum is None:
+                        continue
+                    p = info["page"]
+                    page_image_summary_map.setdefault(p, []).append(img_sum)
 
                 summary = summarize_text(
                     full_text, text_chunks, image_info, page_image_summary_map, 
-                    references=references
+                    references=references, doc_id=doc_id,
+                    faiss_store=result["faiss_store"], embed_pages=not result["embedded"]
                 )
                 
+                # Reference details are fetched by the citation popups on demand
+                try:
+                    save_citation_index(doc_id, build_citation_index(summary, references))
+                except Exception as e:
+                    print(f"Saving citation index failed: {e}")
+
                 if isinstance(summary, list):
                     summary_text = "\n".join([item['response'] for item in summary])
                 else:
@@ -117,7 +165,49 @@ def index():
         except Exception as e:
             error = str(e)
             
-    return render_template("index.html", error=error, summary=summary, audio_filename=audio_filename, references=references)
+    return render_template("index.html", error=error, summary=summary, audio_filename=audio_filename)
+
+@app.route("/ask", methods=["POST"])
+def ask():
+    payload = request.get_json(silent=True) or {}
+    question = (payload.get("question") or "").strip()
+    doc_id = session.get("doc_id")
+    if not question:
+        return jsonify({"error": "Please enter a question."}), 400
+    if not doc_id:
+        return jsonify({"error": "No document has been analyzed in this session."}), 404
+
+    try:
+        pages = retrieve_pages(doc_id, question)
+    except Exception as e:
+        return jsonify({"error": f"Retrieval failed: {e}"}), 500
+    if pages is None:
+        return jsonify({"error": "The document index is no longer available. Please upload the document again."}), 404
+
+    answer = gemini_answer(question, pages, doc_id=doc_id)
+    return jsonify({"answer": answer, "pages": [p["page"] for p in pages]})
+
+@app.route("/references")
+def references_lookup():
+    """Entries and citing paragraphs/pages for the references in ?ids= (e.g. "3-5,7")."""
+    doc_id = session.get("doc_id")
+    if not doc_id:
+        return jsonify({"error": "No document has been analyzed in this session."}), 404
+
+    ref_ids = expand_citation_ids(request.args.get("ids", ""))
+    citations = load_citations(doc_id, ref_ids)
+    if citations is None:
+        return jsonify({"error": "Reference details are no longer available."}), 404
+    return jsonify({"references": citations})
+
+@app.route("/metrics/tokens")
+def token_metrics():
+    """Gemini token usage of this session's document and of the whole process."""
+    doc_id = session.get("doc_id")
+    return jsonify({
+        "document": get_document_usage(doc_id) if doc_id else None,
+        "process": get_total_usage(),
+    })
 
 @app.route('/clean_up')
 def clean_up():
@@ -125,6 +215,7 @@ def clean_up():
     uploaded_filepath = session.pop("uploaded_filepath", None)
     extracted_images = session.pop("extracted_images", [])
     audio_filename = session.pop("audio_filename", None)
+    doc_id = session.pop("doc_id", None)
 
     if uploaded_filepath and os.path.exists(uploaded_filepath):
         os.remove(uploaded_filepath)
@@ -139,7 +230,12 @@ def clean_up():
         if os.path.exists(full_audio_path):
             os.remove(full_audio_path)
 
+    if doc_id:
+        delete_document_index(doc_id)
+
     return redirect(url_for("index"))
 
 if __name__ == "__main__":
+    if prewarm_enabled():
+        prewarm()
     app.run(debug=True, port=8000)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Compare the BM25 and embedding page-alignment engines on a PDF.
+
+Each extracted chunk of reasonable length contributes one query (an excerpt
+from its middle) whose correct answer is the chunk's page. The script reports
+top-1 accuracy, top-5 recall, build time and per-query latency for BM25 and,
+when GEMINI_API_KEY is set, for the FAISS/embedding path plus the agreement
+between the two engines.
+
+Usage:
+    python benchmarks/alignment_benchmark.py path/to/document.pdf [max_queries]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv
+from flask import Flask
+
+from utility.rag_processing import iter_pdf_pages
+from utility.chunk_store import ChunkStore
+from utility.summary_processing import _build_page_text_map, _rank_pages
+from utility.lexical_alignment import BM25Index
+
+
+def _make_queries(text_chunks, max_queries):
+    """Take the middle ~40% of each long chunk as a query labelled with its page."""
+    queries = []
+    for chunk in text_chunks:
+        text = chunk["text"]
+        if len(text) < 200:
+            continue
+        start = int(len(text) * 0.3)
+        queries.append((text[start:start + int(len(text) * 0.4)], int(chunk["page"])))
+    random.Random(0).shuffle(queries)
+    return queries[:max_queries]
+
+
+def _evaluate(name, store, queries, build_seconds):
+    """Run every query through an engine and print accuracy and latency."""
+    top1 = top5 = 0
+    predictions = []
+    start = time.perf_counter()
+    for query, page in queries:
+        ranked = _rank_pages(store, query, k=5)
+        predictions.append(ranked[0] if ranked else None)
+        top1 += bool(ranked) and ranked[0] == page
+        top5 += page in ranked
+    elapsed = time.perf_counter() - start
+
+    n = max(len(queries), 1)
+    print(f"{name:>10}: build {build_seconds * 1000:8.1f} ms | "
+          f"query {elapsed / n * 1000:8.2f} ms | top-1 {top1 / n:6.1%} | top-5 {top5 / n:6.1%}")
+    return predictions
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    load_dotenv()
+    pdf_path = sys.argv[1]
+    max_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    # Extraction reads the user id from the Flask session
+    with Flask(__name__).test_request_context(), tempfile.TemporaryDirectory() as out_dir:
+        text_chunks = ChunkStore()
+        for page in iter_pdf_pages(pdf_path, out_dir):
+            for chunk in page["chunks"]:
+                text_chunks.append(chunk, page["page"])
+
+    page_text_map, page_docs = _build_page_text_map(text_chunks)
+    queries = _make_queries(text_chunks, max_queries)
+    print(f"{len(page_docs)} pages, {len(queries)} queries")
+
+    start = time.perf_counter()
+    bm25 = BM25Index(page_text_map)
+    bm25_predictions = _evaluate("bm25", bm25, queries, time.perf_counter() - start)
+
+    if not os.getenv("GEMINI_API_KEY"):
+        print(" embedding: skipped (GEMINI_API_KEY not set)")
+        return
+
+    from langchain_community.vectorstores import FAISS
+    from utility.vector_index import get_embeddings
+
+    start = time.perf_counter()
+    store = FAISS.from_documents(page_docs, get_embeddings())
+    embedding_predictions = _evaluate("embedding", store, queries, time.perf_counter() - start)
+
+    agreement = sum(a == b for a, b in zip(bm25_predictions, embedding_predictions))
+    print(f" agreement: {agreement / max(len(queries), 1):6.1%} of top-1 pages match")
+
+
+if __name__ == "__main__":
+    main()
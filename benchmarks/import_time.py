@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Check that importing the app stays cheap, so workers start (and reload) quickly.
+
+`import app` is timed in fresh interpreters (nothing cached in sys.modules) and
+the best of a few runs is compared against the budget. The modules that must
+not be loaded at import time are listed in HEAVY_MODULES; any of them showing
+up after the import fails the check as well. Exits non-zero on failure so it
+can run in CI.
+
+Usage:
+    python benchmarks/import_time.py [runs]
+
+Environment:
+    IMPORT_TIME_BUDGET_SECONDS: allowed import time (default 1.0)
+"""
+
+import os
+import sys
+import json
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+IMPORT_TIME_BUDGET_SECONDS = float(os.getenv("IMPORT_TIME_BUDGET_SECONDS", "1.0"))
+
+# Loaded on first use only; importing any of them up front defeats lazy loading
+HEAVY_MODULES = [
+    "fitz",
+    "faiss",
+    "numpy",
+    "PIL.Image",
+    "pyttsx3",
+    "google.generativeai",
+    "langchain_community.vectorstores",
+    "langchain_google_genai",
+]
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def _measure():
+    env = dict(os.environ)
+    env.setdefault("FLASK_SECRET_KEY", "import-time-check")
+    env.pop("PREWARM", None)
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    results = [_measure() for _ in range(runs)]
+    times = sorted(r["seconds"] for r in results)
+    loaded = sorted({m for r in results for m in r["loaded"]})
+
+    print(f"import app: best {times[0]:.3f}s, worst {times[-1]:.3f}s over {runs} run(s) "
+          f"(budget {IMPORT_TIME_BUDGET_SECONDS:.3f}s)")
+
+    failed = False
+    if times[0] > IMPORT_TIME_BUDGET_SECONDS:
+        print("FAIL: import time is over budget")
+        failed = True
+    if loaded:
+        print(f"FAIL: heavy modules imported eagerly: {', '.join(loaded)}")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
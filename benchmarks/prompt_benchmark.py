@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Measure how much prompt compaction shrinks the summary request for a PDF.
+
+The summary content is built the previous way (full text, references included,
+insights concatenated) and with utility.prompt_builder, and both sizes are
+reported in characters and tokens. Tokens are counted with the Gemini
+count_tokens API when GEMINI_API_KEY is set, otherwise estimated as chars / 4.
+
+Usage:
+    python benchmarks/prompt_benchmark.py path/to/document.pdf
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fitz
+from dotenv import load_dotenv
+
+from utility.rag_processing import iter_page_texts, extract_references_from_text
+from utility.prompt_builder import build_summary_content
+
+
+def _legacy_content(full_text, image_summary_map):
+    combined_content = f"TEXT SUMMARY:\n{full_text}\n\nIMAGE INSIGHTS:\n"
+    for page, summaries in sorted(image_summary_map.items()):
+        for s in summaries:
+            combined_content += f"- Page {page}: {s}\n"
+    return combined_content
+
+
+def _token_counter():
+    load_dotenv()
+    if not os.getenv("GEMINI_API_KEY"):
+        return lambda text: len(text) // 4, "estimated"
+    from utility.gemini_summarize_tool import initialize_gemini
+    model = initialize_gemini()
+    return lambda text: model.count_tokens(text).total_tokens, "counted"
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    with fitz.open(sys.argv[1]) as doc:
+        full_text = "\n\n".join(text for text in iter_page_texts(doc) if text)
+
+    count_tokens, how = _token_counter()
+
+    started = time.perf_counter()
+    compacted = build_summary_content(full_text, {}, extract_references_from_text(full_text))
+    build_ms = 1000 * (time.perf_counter() - started)
+    legacy = _legacy_content(full_text, {})
+
+    legacy_tokens = count_tokens(legacy)
+    compacted_tokens = count_tokens(compacted)
+    print(f"{'':<10} {'chars':>10} {'tokens (' + how + ')':>20}")
+    print(f"{'legacy':<10} {len(legacy):>10} {legacy_tokens:>20}")
+    print(f"{'compacted':<10} {len(compacted):>10} {compacted_tokens:>20}")
+    if legacy_tokens:
+        print(f"\ntoken reduction: {1 - compacted_tokens / legacy_tokens:.1%} (built in {build_ms:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Compare the "fast" (text blocks + learned headers/footers) and "dict" (span
+dictionary + fixed 8% band) PDF text-extraction modes.
+
+Speed is the time to extract the text of every page. Fidelity is measured
+against the unfiltered plain text of each page: lines whose normalised form
+repeats on many pages are counted as headers/footers, everything else as
+body. For each mode the script reports the share of body words kept (higher
+is better) and the share of header/footer words kept (lower is better).
+
+Usage:
+    python benchmarks/text_extraction_benchmark.py path/to/document.pdf [repeats]
+"""
+
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fitz
+
+from utility.rag_processing import (
+    iter_page_texts, _furniture_key, BOILERPLATE_MIN_PAGES, BOILERPLATE_PAGE_SHARE,
+)
+
+MODES = ["dict", "fast"]
+
+
+def _words(text):
+    return Counter(text.lower().split())
+
+
+def _reference(doc):
+    """Split the plain text of each page into body words and repeated-line words."""
+    page_lines = [page.get_text("text").splitlines() for page in doc]
+    key_pages = Counter()
+    for lines in page_lines:
+        key_pages.update({_furniture_key(line) for line in lines if line.strip()})
+    min_pages = max(BOILERPLATE_MIN_PAGES, BOILERPLATE_PAGE_SHARE * len(page_lines))
+
+    body, furniture = [], []
+    for lines in page_lines:
+        repeated = [line for line in lines if key_pages[_furniture_key(line)] >= min_pages]
+        kept = [line for line in lines if key_pages[_furniture_key(line)] < min_pages]
+        body.append(_words("\n".join(kept)))
+        furniture.append(_words("\n".join(repeated)))
+    return body, furniture
+
+
+def _share_kept(reference_pages, extracted_pages):
+    total = sum(sum(ref.values()) for ref in reference_pages)
+    if not total:
+        return None
+    kept = sum(sum((ref & got).values()) for ref, got in zip(reference_pages, extracted_pages))
+    return kept / total
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    pdf_path = sys.argv[1]
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with fitz.open(pdf_path) as doc:
+        body, furniture = _reference(doc)
+        print(f"{pdf_path}: {doc.page_count} pages, {repeats} run(s) per mode\n")
+        print(f"{'mode':<6} {'ms/page':>9} {'body kept':>10} {'hdr/ftr kept':>13}")
+
+        outputs = {}
+        for mode in MODES:
+            best = None
+            for _ in range(repeats):
+                started = time.perf_counter()
+                texts = list(iter_page_texts(doc, mode))
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            outputs[mode] = texts
+
+            extracted = [_words(text) for text in texts]
+            body_kept = _share_kept(body, extracted)
+            furniture_kept = _share_kept(furniture, extracted)
+            print(f"{mode:<6} {1000 * best / max(doc.page_count, 1):>9.2f} "
+                  f"{'-' if body_kept is None else f'{body_kept:.1%}':>10} "
+                  f"{'-' if furniture_kept is None else f'{furniture_kept:.1%}':>13}")
+
+    fast = sum((_words(t) for t in outputs["fast"]), Counter())
+    legacy = sum((_words(t) for t in outputs["dict"]), Counter())
+    union = sum((fast | legacy).values())
+    if union:
+        print(f"\nword overlap between modes: {sum((fast & legacy).values()) / union:.1%}")
+
+
+if __name__ == "__main__":
+    main()
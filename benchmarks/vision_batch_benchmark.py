@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Measure batched vision requests for different batch sizes on a PDF's images.
+
+For each batch size the extracted images are summarised through the vision
+scheduler without a call or time budget, and the script reports wall-clock
+time, batched requests, single-image fallback requests and failed summaries.
+Requires GEMINI_API_KEY; every run spends real quota.
+
+Usage:
+    python benchmarks/vision_batch_benchmark.py path/to/document.pdf [batch sizes, default 1,2,4,8]
+"""
+
+import os
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv
+from flask import Flask
+
+from utility.rag_processing import iter_pdf_pages
+from utility.chunk_store import ChunkStore
+from utility.vision_scheduler import VisionScheduler, VISION_MAX_WORKERS
+import utility.gemini_image_summarize as vision
+
+
+def _run(jobs, batch_size):
+    """Summarise all jobs with one batch size and return timing and request counts."""
+    single_calls = 0
+    process_single_image = vision.process_single_image
+
+    def counting_single_image(path, page_text="", **kwargs):
+        nonlocal single_calls
+        single_calls += 1
+        return process_single_image(path, page_text, **kwargs)
+
+    vision.process_single_image = counting_single_image
+    try:
+        scheduler = VisionScheduler(vision.process_image_batch, max_calls=0, time_budget=0,
+                                    max_workers=min(VISION_MAX_WORKERS, len(jobs)), batch_size=batch_size)
+        for index, (path, page_text, meta) in enumerate(jobs):
+            scheduler.submit(index, path, page_text, meta)
+        start = time.perf_counter()
+        scheduler.start()
+        results = scheduler.wait()
+        elapsed = time.perf_counter() - start
+    finally:
+        vision.process_single_image = process_single_image
+
+    # Single-image fallbacks are scheduled (and counted) like any other request
+    batched_calls = scheduler.calls - single_calls
+    failed = sum(1 for s in results.values() if not s or s.startswith(("Processing error", "API_LIMIT", "Thread error")))
+    return elapsed, batched_calls, single_calls, failed
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    load_dotenv()
+    if not os.getenv("GEMINI_API_KEY"):
+        print("GEMINI_API_KEY not set")
+        sys.exit(1)
+    batch_sizes = [int(b) for b in sys.argv[2].split(",")] if len(sys.argv) > 2 else [1, 2, 4, 8]
+
+    with Flask(__name__).test_request_context(), tempfile.TemporaryDirectory() as out_dir:
+        text_chunks, image_info = ChunkStore(), []
+        for page in iter_pdf_pages(sys.argv[1], out_dir):
+            for chunk in page["chunks"]:
+                text_chunks.append(chunk, page["page"])
+            image_info.extend(page["images"])
+        jobs = [(os.path.join(out_dir, "static", info["path"]), text_chunks.page_text(info["page"]), info)
+                for info in image_info]
+        print(f"{len(jobs)} images")
+        if not jobs:
+            return
+
+        for batch_size in batch_sizes:
+            elapsed, batched, single, failed = _run(jobs, batch_size)
+            print(f"batch {batch_size:>2}: {elapsed:7.2f} s | batched requests {batched:>3} | "
+                  f"single requests {single:>3} | failed {failed:>3}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+# gunicorn.conf.py
+# Usage: gunicorn -c gunicorn.conf.py app:app
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+# Summaries of long documents take a while; don't let gunicorn kill the worker
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))
+
+
+def post_worker_init(worker):
+    """Pre-warm each worker after fork so model clients are never shared across processes."""
+    from app import prewarm, prewarm_enabled
+
+    if prewarm_enabled():
+        worker.log.info("Pre-warming worker %s", worker.pid)
+        prewarm()
@@ -77,7 +77,7 @@ document.addEventListener('DOMContentLoaded', function () {
     renderMarkdownContent();
 
     // Submit button spinner
-    document.querySelector('form')?.addEventListener('submit', function (e) {
+    document.getElementById('submitBtn')?.closest('form')?.addEventListener('submit', function (e) {
         const btn = document.getElementById('submitBtn');
         btn.innerHTML = `
             <span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span>
@@ -120,6 +120,41 @@ document.addEventListener('DOMContentLoaded', function () {
         });
     }
 
+    // Follow-up question form
+    const qaForm = document.getElementById('qaForm');
+    const qaAnswer = document.getElementById('qaAnswer');
+    qaForm?.addEventListener('submit', function (e) {
+        e.preventDefault();
+        const questionInput = document.getElementById('qaQuestion');
+        const qaSubmitBtn = document.getElementById('qaSubmitBtn');
+        const question = questionInput.value.trim();
+        if (!question) return;
+
+        qaSubmitBtn.disabled = true;
+        qaAnswer.textContent = 'Thinking...';
+        fetch('/ask', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ question })
+        })
+            .then(response => response.json())
+            .then(data => {
+                const text = data.error || data.answer || 'No answer returned.';
+                if (window.marked) {
+                    qaAnswer.innerHTML = marked.parse(text);
+                } else {
+                    qaAnswer.textContent = text;
+                }
+            })
+            .catch(err => {
+                console.error('Error asking question:', err);
+                qaAnswer.textContent = 'Could not get an answer. Please try again.';
+            })
+            .finally(() => {
+                qaSubmitBtn.disabled = false;
+            });
+    });
+
     // Audio player time update handler
     const audioPlayer = document.getElementById('audioPlayer');
     if (audioPlayer) {
@@ -167,15 +202,42 @@ document.addEventListener('DOMContentLoaded', function () {
         });
     }
 
-    // Get references data from the hidden input field
-    const referencesDataElement = document.getElementById('references-data');
-    let references = {};
-    if (referencesDataElement && referencesDataElement.value) {
-        try {
-            references = JSON.parse(referencesDataElement.value);
-        } catch (e) {
-            console.error('Error parsing references data:', e);
+    // Reference details are fetched from the server on first click and cached here
+    const referenceCache = {};
+
+    function escapeHtml(text) {
+        const div = document.createElement('div');
+        div.textContent = text;
+        return div.innerHTML;
+    }
+
+    function loadReferences(refIds) {
+        const missing = refIds.filter(id => !(id in referenceCache));
+        if (missing.length === 0) {
+            return Promise.resolve();
+        }
+        return fetch('/references?ids=' + encodeURIComponent(missing.join(',')))
+            .then(response => response.json())
+            .then(data => {
+                if (data.error) {
+                    throw new Error(data.error);
+                }
+                missing.forEach(id => {
+                    referenceCache[id] = (data.references || {})[id] || null;
+                });
+            });
+    }
+
+    function renderReference(id) {
+        const ref = referenceCache[id];
+        if (!ref || !ref.full_text) {
+            return `<p><strong>[${id}]</strong> Details not found.</p>`;
+        }
+        let html = `<p><strong>[${id}]</strong> ${escapeHtml(ref.full_text)}`;
+        if (ref.pages && ref.pages.length) {
+            html += `<br><small class="text-muted">Cited in the summary of page ${ref.pages.join(', ')}</small>`;
         }
+        return html + '</p>';
     }
 
     // Handle click on inline citations using event delegation
@@ -204,24 +266,18 @@ document.addEventListener('DOMContentLoaded', function () {
                 }
             });
 
-            let modalContent = '';
-            if (Object.keys(references).length === 0) {
-                modalContent = '<p>Reference details not loaded.</p>';
-            } else {
-                refIds.forEach(id => {
-                    const ref = references[id];
-                    if (ref && ref.full_text) {
-                        modalContent += `<p><strong>[${id}]</strong> ${ref.full_text}</p>`;
-                    } else {
-                        modalContent += `<p><strong>[${id}]</strong> Details not found.</p>`;
-                    }
-                });
-            }
-
-            // Populate and show the Bootstrap modal
             const referenceModal = new bootstrap.Modal(document.getElementById('referenceModal'));
-            document.getElementById('referenceModalBody').innerHTML = modalContent;
+            const modalBody = document.getElementById('referenceModalBody');
+            modalBody.innerHTML = '<p>Loading reference details...</p>';
             referenceModal.show();
+
+            loadReferences(refIds)
+                .then(() => {
+                    modalBody.innerHTML = refIds.map(renderReference).join('');
+                })
+                .catch(err => {
+                    modalBody.innerHTML = `<p>Reference details not loaded: ${escapeHtml(err.message)}</p>`;
+                });
         }
     });
-});
\ No newline at end of file
+});
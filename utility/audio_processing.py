@@ -4,7 +4,6 @@ Converting text to audio using lightweight pyttsx3 library.
 Writes audio files using system's built-in TTS engine.
 """
 
-import pyttsx3
 from flask import session
 import os
 from pathlib import Path
@@ -17,6 +16,8 @@ os.makedirs(AUDIO_FOLDER, exist_ok=True)
 
 def initialize_tts():
     """Initialize the text-to-speech engine"""
+    import pyttsx3
+
     engine = pyttsx3.init()
     
     # Configure voice settings for better quality
@@ -0,0 +1,95 @@
+from array import array
+
+
+class ChunkStore:
+    """
+    Append-only store of text chunks backed by a single text buffer.
+
+    Chunk i is buffer[starts[i]:ends[i]] and belongs to pages[i]. Chunks are
+    appended in page order, so the chunks of a page form one contiguous run and
+    the page text ("\\n\\n"-joined chunks) is a single slice of the buffer found
+    through the per-page index in O(1).
+
+    Iterating or indexing yields {'text': ..., 'page': ...} dicts, so callers
+    written against the old list-of-dicts layout keep working.
+    """
+
+    SEPARATOR = "\n\n"
+
+    def __init__(self):
+        self._parts = []
+        self._length = 0
+        self._buffer = None
+        self.starts = array("q")
+        self.ends = array("q")
+        self.pages = array("q")
+        # page -> [first chunk index, last chunk index + 1]
+        self._page_spans = {}
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        """Build a store from an iterable of {'text', 'page'} dicts."""
+        store = cls()
+        for chunk in sorted(chunks, key=lambda c: int(c.get("page") or 0)):
+            store.append(chunk.get("text") or "", int(chunk.get("page") or 0))
+        return store
+
+    def append(self, text: str, page: int):
+        """Add a chunk for page; empty chunks are ignored."""
+        text = text.strip()
+        if not text:
+            return
+
+        index = len(self.starts)
+        span = self._page_spans.get(page)
+        if span is not None and span[1] != index:
+            raise ValueError(f"Chunks for page {page} must be appended contiguously")
+
+        if self._length:
+            self._parts.append(self.SEPARATOR)
+            self._length += len(self.SEPARATOR)
+        self.starts.append(self._length)
+        self._parts.append(text)
+        self._length += len(text)
+        self.ends.append(self._length)
+        self.pages.append(page)
+        self._buffer = None
+
+        if span is None:
+            self._page_spans[page] = [index, index + 1]
+        else:
+            span[1] = index + 1
+
+    @property
+    def buffer(self) -> str:
+        """The joined text of all chunks, built once per batch of appends."""
+        if self._buffer is None:
+            self._buffer = "".join(self._parts)
+            self._parts = [self._buffer]
+        return self._buffer
+
+    def text(self, index: int) -> str:
+        return self.buffer[self.starts[index]:self.ends[index]]
+
+    def page_numbers(self) -> list[int]:
+        """Pages that have at least one chunk, in the order they were added."""
+        return list(self._page_spans)
+
+    def page_text(self, page: int) -> str:
+        """Return all chunk text of a page joined by blank lines, or ''."""
+        span = self._page_spans.get(page)
+        if span is None:
+            return ""
+        first, last = span
+        return self.buffer[self.starts[first]:self.ends[last - 1]]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        return {"text": self.text(index), "page": self.pages[index]}
+
+    def __iter__(self):
+        buffer = self.buffer
+        for start, end, page in zip(self.starts, self.ends, self.pages):
+            yield {"text": buffer[start:end], "page": page}
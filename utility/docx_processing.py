@@ -0,0 +1,229 @@
+from flask import session
+import os
+import posixpath
+import re
+import shutil
+import zipfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from utility.rag_processing import _split_long_paragraph
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+A_NS = "http://schemas.openxmlformats.org/drawingml/2006/main"
+V_NS = "urn:schemas-microsoft-com:vml"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+W_P = f"{{{W_NS}}}p"
+W_TBL = f"{{{W_NS}}}tbl"
+W_BODY = f"{{{W_NS}}}body"
+W_T = f"{{{W_NS}}}t"
+W_TAB = f"{{{W_NS}}}tab"
+W_BR = f"{{{W_NS}}}br"
+W_CR = f"{{{W_NS}}}cr"
+W_PSTYLE = f"{{{W_NS}}}pStyle"
+W_OUTLINE = f"{{{W_NS}}}outlineLvl"
+W_VAL = f"{{{W_NS}}}val"
+W_STYLE_ID = f"{{{W_NS}}}styleId"
+A_BLIP = f"{{{A_NS}}}blip"
+V_IMAGEDATA = f"{{{V_NS}}}imagedata"
+R_EMBED = f"{{{R_NS}}}embed"
+R_ID = f"{{{R_NS}}}id"
+
+# Formats Pillow (and therefore the vision step) can open; EMF/WMF are skipped.
+SUPPORTED_IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tif", ".tiff", ".webp"}
+
+_HEADING_NAME_PATTERN = re.compile(r"^(heading\s*\d*|title)$", re.IGNORECASE)
+
+# Word uses outline level 9 for body text; levels 0-8 are headings
+BODY_TEXT_OUTLINE_LEVEL = "9"
+
+# A section is closed at this size even without a heading, so documents without
+# heading styles still yield page-sized sections for embedding and alignment
+DOCX_SECTION_MAX_CHARS = int(os.getenv("DOCX_SECTION_MAX_CHARS", "4000"))
+
+
+def _load_relationships(zf: zipfile.ZipFile) -> dict[str, str]:
+    """Map relationship ids of word/document.xml to archive member names."""
+    rels_name = "word/_rels/document.xml.rels"
+    if rels_name not in zf.namelist():
+        return {}
+
+    rels = {}
+    with zf.open(rels_name) as f:
+        for rel in ET.parse(f).getroot().iter(f"{{{PKG_REL_NS}}}Relationship"):
+            if rel.get("TargetMode") == "External":
+                continue
+            target = rel.get("Target") or ""
+            if target.startswith("/"):
+                member = target.lstrip("/")
+            else:
+                member = posixpath.normpath(posixpath.join("word", target))
+            rels[rel.get("Id")] = member
+    return rels
+
+
+def _has_heading_outline(element) -> bool:
+    """Check whether a pPr (or style) element sets a heading outline level."""
+    outline = element.find(f".//{W_OUTLINE}")
+    return outline is not None and outline.get(W_VAL) != BODY_TEXT_OUTLINE_LEVEL
+
+
+def _heading_style_ids(zf: zipfile.ZipFile) -> set[str]:
+    """Return style ids that mark headings (by style name or outline level)."""
+    style_ids = set()
+    if "word/styles.xml" not in zf.namelist():
+        return style_ids
+
+    with zf.open("word/styles.xml") as f:
+        for style in ET.parse(f).getroot().iter(f"{{{W_NS}}}style"):
+            style_id = style.get(W_STYLE_ID)
+            name_el = style.find(f"{{{W_NS}}}name")
+            name = name_el.get(W_VAL) if name_el is not None else ""
+            if _HEADING_NAME_PATTERN.match(name or "") or _has_heading_outline(style):
+                if style_id:
+                    style_ids.add(style_id)
+    return style_ids
+
+
+def _is_heading(paragraph, heading_styles: set[str]) -> bool:
+    """Check whether a <w:p> element is a heading paragraph."""
+    ppr = paragraph.find(f"{{{W_NS}}}pPr")
+    if ppr is None:
+        return False
+    if _has_heading_outline(ppr):
+        return True
+    style = ppr.find(W_PSTYLE)
+    if style is None:
+        return False
+    style_id = style.get(W_VAL) or ""
+    return style_id in heading_styles or bool(_HEADING_NAME_PATTERN.match(style_id))
+
+
+def _paragraph_text(paragraph) -> str:
+    """Concatenate the runs of a paragraph, keeping tabs and line breaks."""
+    parts = []
+    for el in paragraph.iter():
+        if el.tag == W_T:
+            parts.append(el.text or "")
+        elif el.tag == W_TAB:
+            parts.append("\t")
+        elif el.tag in (W_BR, W_CR):
+            parts.append("\n")
+    return "".join(parts).strip()
+
+
+def _paragraph_image_ids(paragraph) -> list[str]:
+    """Return relationship ids of images embedded in a paragraph."""
+    ids = []
+    for el in paragraph.iter():
+        if el.tag == A_BLIP:
+            rid = el.get(R_EMBED)
+        elif el.tag == V_IMAGEDATA:
+            rid = el.get(R_ID)
+        else:
+            continue
+        if rid:
+            ids.append(rid)
+    return ids
+
+
+def iter_docx_sections(zf: zipfile.ZipFile):
+    """
+    Stream word/document.xml and yield sections split at heading paragraphs,
+    and wherever a section would grow past DOCX_SECTION_MAX_CHARS.
+
+    Each yielded item is a tuple (paragraphs, image_rel_ids) for one section.
+    Paragraphs longer than the limit are split at sentence boundaries. Parsed
+    elements are discarded as soon as they are consumed, so memory use is
+    bounded by the section size rather than by the document size.
+    """
+    heading_styles = _heading_style_ids(zf)
+
+    paragraphs, image_ids = [], []
+    section_chars = 0
+    stack = []
+    with zf.open("word/document.xml") as f:
+        for event, el in ET.iterparse(f, events=("start", "end")):
+            if event == "start":
+                stack.append(el)
+                continue
+
+            stack.pop()
+            if el.tag != W_P:
+                if el.tag == W_TBL and stack and stack[-1].tag == W_BODY:
+                    stack[-1].remove(el)
+                continue
+
+            text = _paragraph_text(el)
+            if text and paragraphs and _is_heading(el, heading_styles):
+                yield paragraphs, image_ids
+                paragraphs, image_ids, section_chars = [], [], 0
+            if text:
+                pieces = _split_long_paragraph(text) if len(text) > DOCX_SECTION_MAX_CHARS else [text]
+                for piece in pieces:
+                    if paragraphs and section_chars + len(piece) > DOCX_SECTION_MAX_CHARS:
+                        yield paragraphs, image_ids
+                        paragraphs, image_ids, section_chars = [], [], 0
+                    paragraphs.append(piece)
+                    section_chars += len(piece)
+            image_ids.extend(_paragraph_image_ids(el))
+
+            # Drop the parsed paragraph so the tree never holds the whole document
+            el.clear()
+            if stack and stack[-1].tag == W_BODY:
+                stack[-1].remove(el)
+
+    if paragraphs or image_ids:
+        yield paragraphs, image_ids
+
+
+def iter_docx_pages(docx_path: str, base_output_dir: str):
+    """
+    Extracts a DOCX file section by section, yielding each section (used as a
+    "page") with its paragraphs and newly saved images as soon as it is parsed.
+
+    Yields:
+        dict: {'page': section_number, 'text': 'section text', 'chunks': [paragraph, ...],
+               'images': [image information dicts first seen in this section]}
+    """
+    images_out_dir = Path(base_output_dir) / "static" / "images"
+    os.makedirs(images_out_dir, exist_ok=True)
+
+    saved_images = {}
+
+    with zipfile.ZipFile(docx_path) as zf:
+        rels = _load_relationships(zf)
+
+        for section_num, (paragraphs, image_ids) in enumerate(iter_docx_sections(zf), start=1):
+            section_images = []
+            for rid in image_ids:
+                member = rels.get(rid)
+                if not member:
+                    continue
+                if member in saved_images:
+                    pages = saved_images[member]["pages"]
+                    if pages[-1] != section_num:
+                        pages.append(section_num)
+                    continue
+                ext = posixpath.splitext(member)[1].lower()
+                if ext not in SUPPORTED_IMAGE_EXTENSIONS:
+                    continue
+                try:
+                    img_filename = f"{session.get('user_id')}_section{section_num}_img{len(saved_images) + 1}{ext}"
+                    img_path = images_out_dir / img_filename
+                    # Copy straight from the archive without loading the image into memory
+                    with zf.open(member) as src, open(img_path, "wb") as dst:
+                        shutil.copyfileobj(src, dst)
+                except (KeyError, OSError) as e:
+                    print(f"Error extracting image {member} in section {section_num}: {e}")
+                    continue
+
+                web_path = os.path.join("images", img_filename).replace("\\", "/")
+                entry = {"path": web_path, "page": section_num, "pages": [section_num], "kind": "raster"}
+                saved_images[member] = entry
+                section_images.append(entry)
+
+            yield {"page": section_num, "text": "\n\n".join(paragraphs), "chunks": paragraphs,
+                   "images": section_images}
@@ -1,14 +1,28 @@
-import google.generativeai as genai
 import os
+import re
+import json
+import threading
 from dotenv import load_dotenv
-from PIL import Image
 import time
-import asyncio
-import concurrent.futures
-from google.api_core.exceptions import ResourceExhausted, RetryError
+
+from utility.token_metrics import record_usage
+
+# Page text sent with each image of a batched request is capped to keep the payload small
+BATCH_CONTEXT_CHARS = 1500
+
+_JSON_FENCE_PATTERN = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+_model = None
+_model_lock = threading.Lock()
 
 def initialize_gemini():
-    """Initialize the Gemini API with API key"""
+    """Initialize the Gemini API with API key; the model is created once per process"""
+    global _model
+    if _model is not None:
+        return _model
+
+    import google.generativeai as genai
+
     load_dotenv()
     api_key = os.getenv('GEMINI_API_KEY')
     if not api_key:
@@ -18,13 +32,19 @@ def initialize_gemini():
     
     # Use the correct model name for vision capabilities
     try:
-        return genai.GenerativeModel('gemini-1.5-flash')
+        with _model_lock:
+            if _model is None:
+                _model = genai.GenerativeModel('gemini-1.5-flash')
+        return _model
     except Exception as e:
         print(f"Failed to initialize gemini-1.5-flash: {e}")
         raise ValueError("Failed to initialize Gemini vision model. Please check your API access.")
 
-def process_single_image(image_path, page_text=""):
+def process_single_image(image_path, page_text="", doc_id=None):
     """Process a single image with its page text context and return its summary"""
+    from PIL import Image
+    from google.api_core.exceptions import ResourceExhausted, RetryError
+
     retries = 0
     max_retries = 3
     
@@ -53,7 +73,9 @@ def process_single_image(image_path, page_text=""):
             else:
                 prompt = "Analyze this image (chart, graph, table, or figure) and summarize its key insights in exactly 30 words or less, including important numbers and trends."
             
+            started = time.perf_counter()
             response = model.generate_content([prompt, img])
+            record_usage(doc_id, "vision", response, time.perf_counter() - started)
             if response.text:
                 return response.text.strip()
             else:
@@ -72,52 +94,93 @@ def process_single_image(image_path, page_text=""):
             print(f"Error processing image {os.path.basename(image_path)}: {e}")
             return f"Processing error: {os.path.basename(image_path)}"
 
-def gemini_image_summarize(image_paths, page_texts=None):
+def _parse_batch_response(text, count):
     """
-    Summarize images using Gemini API in parallel with page text context.
-    Args:
-        image_paths (list): A list of paths to image files.
-        page_texts (list, optional): A list of page texts corresponding to each image.
-    Returns:
-        list: A list of summarized text for each image, or a signal on failure.
+    Parse the JSON array returned for a batched request into `count` ordered
+    summaries. Returns None when the output is not usable as a whole; images
+    whose entry is missing or empty get None in the list.
     """
-    if not image_paths:
-        return []
-    
-    # If no page texts provided, use empty strings
-    if page_texts is None:
-        page_texts = [""] * len(image_paths)
-    
-    # Ensure page_texts list matches image_paths length
-    if len(page_texts) != len(image_paths):
-        print(f"Warning: page_texts length ({len(page_texts)}) doesn't match image_paths length ({len(image_paths)})")
-        page_texts = page_texts + [""] * (len(image_paths) - len(page_texts))
-    
     try:
-        # Use ThreadPoolExecutor for parallel processing
-        with concurrent.futures.ThreadPoolExecutor(max_workers=min(5, len(image_paths))) as executor:
-            # Submit all image processing tasks with page text context
-            future_to_path = {
-                executor.submit(process_single_image, path, page_text): path 
-                for path, page_text in zip(image_paths, page_texts)
-            }
-            summaries = []
-            
-            # Collect results in order
-            for future in concurrent.futures.as_completed(future_to_path):
-                path = future_to_path[future]
-                try:
-                    result = future.result()
-                    summaries.append((path, result))
-                except Exception as e:
-                    print(f"Thread execution failed for {os.path.basename(path)}: {e}")
-                    summaries.append((path, f"Thread error: {os.path.basename(path)}"))
-            
-            # Sort results to maintain original order
-            summaries.sort(key=lambda x: image_paths.index(x[0]))
-            return [summary for _, summary in summaries]
-                
-    except Exception as e:
-        print(f"Vision model initialization failed: {e}")
-        # Return a more specific error message instead of generic unavailable
-        return ["VISION_INITIALIZATION_FAILED"] * len(image_paths)
+        items = json.loads(_JSON_FENCE_PATTERN.sub("", (text or "").strip()))
+    except ValueError:
+        return None
+    if not isinstance(items, list):
+        return None
+
+    summaries = [None] * count
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        try:
+            index = int(item.get("image", position + 1)) - 1
+        except (TypeError, ValueError):
+            continue
+        summary = str(item.get("summary") or "").strip()
+        if 0 <= index < count and summary:
+            summaries[index] = summary
+    return summaries
+
+
+def process_image_batch(jobs, doc_id=None):
+    """
+    Process several (image_path, page_text) pairs in one multimodal request and
+    return their summaries in order. Images the batched answer does not cover
+    get None; the vision scheduler queues them again as single-image requests,
+    so those retries are charged to the vision budget.
+    """
+    if len(jobs) == 1:
+        return [process_single_image(*jobs[0], doc_id=doc_id)]
+
+    from PIL import Image
+    from google.api_core.exceptions import ResourceExhausted, RetryError
+
+    existing = [(i, path, text) for i, (path, text) in enumerate(jobs) if os.path.exists(path)]
+    summaries = [None] * len(jobs)
+    for i, (path, _) in enumerate(jobs):
+        if not os.path.exists(path):
+            summaries[i] = f"Image not found: {os.path.basename(path)}"
+
+    retries = 0
+    max_retries = 3
+    while existing and retries < max_retries:
+        try:
+            model = initialize_gemini()
+            contents = [f"""
+You will receive {len(existing)} images (charts, graphs, tables, or figures). Each one is preceded
+by its label and the text of the page it appears on.
+For every image, provide an integrated analysis in exactly 30 words or less that connects the visual
+content with its page text, focusing on key numbers, trends, and how the image supports the text.
+Respond with only a JSON array, one object per image in the given order:
+[{{"image": 1, "summary": "..."}}, {{"image": 2, "summary": "..."}}]
+            """.strip()]
+            for label, (_, path, page_text) in enumerate(existing, start=1):
+                context = (page_text or "").strip()[:BATCH_CONTEXT_CHARS]
+                contents.append(f"Image {label} - page text context:\n{context or '(none)'}")
+                contents.append(Image.open(path))
+
+            started = time.perf_counter()
+            response = model.generate_content(
+                contents, generation_config={"response_mime_type": "application/json"}
+            )
+            record_usage(doc_id, "vision", response, time.perf_counter() - started)
+            parsed = _parse_batch_response(response.text, len(existing)) or [None] * len(existing)
+            for (i, _, _), summary in zip(existing, parsed):
+                summaries[i] = summary
+            break
+
+        except (ResourceExhausted, RetryError):
+            wait_time = 2 ** retries  # Exponential backoff
+            print(f"API limit reached for a batch of {len(existing)} images. Retrying in {wait_time} seconds...")
+            time.sleep(wait_time)
+            retries += 1
+            if retries == max_retries:
+                # Retrying each image on its own would only add load while the quota is exhausted
+                print(f"Max retries reached for a batch of {len(existing)} images. Skipping batch.")
+                for i, path, _ in existing:
+                    summaries[i] = f"API_LIMIT_EXCEEDED: {os.path.basename(path)}"
+
+        except Exception as e:
+            print(f"Error processing image batch: {e}")
+            break
+
+    return summaries
@@ -1,9 +1,14 @@
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
 import time
-from google.api_core.exceptions import ResourceExhausted
 import re
+import threading
+
+from utility.token_metrics import record_usage
+
+
+# In-text citations such as [1], [3-5] or [2, 7]
+CITATION_PATTERN = re.compile(r'\[\s*([\d,\s\-]+?)\s*\]')
 
 
 def _replace_citations_with_references(text: str, references: dict) -> str:
@@ -15,12 +20,21 @@ def _replace_citations_with_references(text: str, references: dict) -> str:
         citation_str = match.group(1)
         return f'<span class="citation-hover" data-ref-id="{citation_str}">[{citation_str}]</span>'
 
-    citation_pattern = re.compile(r'\[\s*([\d,\s\-]+?)\s*\]')
-    return citation_pattern.sub(wrap_match, text)
+    return CITATION_PATTERN.sub(wrap_match, text)
+
+
+_model = None
+_model_lock = threading.Lock()
 
 
 def initialize_gemini():
-    """Initialize the Gemini API with API key."""
+    """Initialize the Gemini API with API key; the model is created once per process."""
+    global _model
+    if _model is not None:
+        return _model
+
+    import google.generativeai as genai
+
     load_dotenv()
     api_key = os.getenv('GEMINI_API_KEY')
     if not api_key:
@@ -34,7 +48,10 @@ def initialize_gemini():
     last_err = None
     for name in model_names:
         try:
-            return genai.GenerativeModel(name)
+            with _model_lock:
+                if _model is None:
+                    _model = genai.GenerativeModel(name)
+            return _model
         except Exception as e:
             last_err = e
             continue
@@ -67,11 +84,14 @@ def _force_min_paragraphs(text: str, min_paragraphs: int = 10) -> str:
     return "\n\n".join(forced[:max(min_paragraphs, len(forced))])
 
 
-def gemini_summarize(text, references=None, min_paragraphs: int = 10):
+def gemini_summarize(text, references=None, min_paragraphs: int = 10, doc_id=None):
     """
     Summarize text using Gemini API.
     Ensures at least `min_paragraphs` paragraphs.
+    Token usage is recorded under `doc_id` (see utility.token_metrics).
     """
+    from google.api_core.exceptions import ResourceExhausted
+
     retries = 0
     max_retries = 5
     while retries < max_retries:
@@ -91,7 +111,9 @@ CONTENT TO SUMMARIZE:
 {text}
             """.strip()
 
+            started = time.perf_counter()
             response = model.generate_content(prompt)
+            record_usage(doc_id, "summary", response, time.perf_counter() - started)
             summary_text = response.text or ""
 
             # Remove explicit "Table/Figure" mentions
@@ -112,4 +134,47 @@ CONTENT TO SUMMARIZE:
             if retries == max_retries:
                 return f"Error generating summary: Max retries reached - {str(e)}"
         except Exception as e:
-            return f"Error generating summary: {str(e)}"
\ No newline at end of file
+            return f"Error generating summary: {str(e)}"
+
+def gemini_answer(question, pages, doc_id=None):
+    """
+    Answer a follow-up question using only the retrieved page texts.
+    `pages` is a list of {'page': ..., 'text': ...} dicts.
+    """
+    from google.api_core.exceptions import ResourceExhausted
+
+    context = "\n\n".join(f"[Page {p['page']}]\n{p['text']}" for p in pages)
+    retries = 0
+    max_retries = 3
+    while retries < max_retries:
+        try:
+            model = initialize_gemini()
+            prompt = f"""
+You are answering a question about a document using the excerpts below.
+
+REQUIREMENTS:
+- Answer only from the excerpts; say so if they do not contain the answer.
+- Be concise (at most two short paragraphs).
+- Mention the page numbers you relied on, e.g. (Page 3).
+
+DOCUMENT EXCERPTS:
+{context}
+
+QUESTION:
+{question}
+            """.strip()
+
+            started = time.perf_counter()
+            response = model.generate_content(prompt)
+            record_usage(doc_id, "answer", response, time.perf_counter() - started)
+            return (response.text or "").strip()
+
+        except ResourceExhausted as e:
+            wait_time = 2 ** retries
+            print(f"Quota exceeded, retrying in {wait_time} sec...")
+            time.sleep(wait_time)
+            retries += 1
+            if retries == max_retries:
+                return f"Error generating answer: Max retries reached - {str(e)}"
+        except Exception as e:
+            return f"Error generating answer: {str(e)}"
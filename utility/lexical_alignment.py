@@ -0,0 +1,84 @@
+import re
+from collections import Counter
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Short list of function words that carry no signal for page matching
+STOPWORDS = frozenset("""
+a an and are as at be been but by can for from had has have in into is it its of on or our
+that the their these this those to was we were which while with within without also than then
+there they such not may more most other over under between both each only same so very
+""".split())
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens without stopwords or single characters."""
+    return [t for t in _TOKEN_PATTERN.findall((text or "").lower())
+            if len(t) > 1 and t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-process BM25 index over page texts, used to align summary paragraphs
+    with pages without any network calls.
+
+    Postings are stored CSR-style in NumPy arrays: for term id t the postings
+    live in post_pages[term_ptr[t]:term_ptr[t + 1]] with their precomputed
+    BM25 weights in post_weights, so scoring a query is a single bincount.
+    """
+
+    def __init__(self, page_text_map: dict, k1: float = 1.5, b: float = 0.75):
+        self.pages = [p for p, txt in sorted(page_text_map.items()) if txt]
+        self.vocab = {}
+
+        term_ids, page_idx, tfs = [], [], []
+        doc_len = np.zeros(len(self.pages), dtype=np.float32)
+        for i, page in enumerate(self.pages):
+            counts = Counter(tokenize(page_text_map[page]))
+            doc_len[i] = sum(counts.values())
+            for term, tf in counts.items():
+                term_ids.append(self.vocab.setdefault(term, len(self.vocab)))
+                page_idx.append(i)
+                tfs.append(tf)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        self.post_pages = np.asarray(page_idx, dtype=np.int32)[order]
+        tfs = np.asarray(tfs, dtype=np.float32)[order]
+
+        df = np.bincount(term_ids, minlength=len(self.vocab))
+        self.term_ptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(df, out=self.term_ptr[1:])
+        df = df.astype(np.float32)
+
+        n_pages = len(self.pages)
+        avgdl = float(doc_len.mean()) if n_pages and doc_len.mean() > 0 else 1.0
+        idf = np.log1p((n_pages - df + 0.5) / (df + 0.5))
+        norm = k1 * (1.0 - b + b * doc_len[self.post_pages] / avgdl)
+        term_of_posting = term_ids[order]
+        self.post_weights = idf[term_of_posting] * tfs * (k1 + 1.0) / (tfs + norm)
+
+    def score(self, text: str) -> np.ndarray:
+        """Return the BM25 score of every page for the given query text."""
+        scores = np.zeros(len(self.pages), dtype=np.float32)
+        query = Counter(t for t in tokenize(text) if t in self.vocab)
+        if not query:
+            return scores
+
+        slices = [(self.term_ptr[self.vocab[t]], self.term_ptr[self.vocab[t] + 1], qtf)
+                  for t, qtf in query.items()]
+        pages = np.concatenate([self.post_pages[s:e] for s, e, _ in slices])
+        weights = np.concatenate([self.post_weights[s:e] * qtf for s, e, qtf in slices])
+        return np.bincount(pages, weights=weights, minlength=len(self.pages)).astype(np.float32)
+
+    def rank_pages(self, text: str, k: int = 5) -> list[int]:
+        """Return up to k page numbers with a positive score, best first."""
+        if not self.pages:
+            return []
+        scores = self.score(text)
+        k = min(k, len(self.pages))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [self.pages[i] for i in top if scores[i] > 0]
@@ -0,0 +1,155 @@
+import os
+import queue
+import threading
+from functools import partial
+
+from utility.chunk_store import ChunkStore
+from utility.rag_processing import extract_references_from_text
+from utility.vision_scheduler import VisionScheduler
+from utility.gemini_image_summarize import process_image_batch
+from utility.summary_processing import ALIGNMENT_ENGINE
+from utility.vector_index import get_embeddings
+
+# Pages sent to the embedding model per request while the document streams in
+EMBED_BATCH_PAGES = int(os.getenv("EMBED_BATCH_PAGES", "8"))
+
+
+class PageEmbedder:
+    """
+    Embedding stage: builds the FAISS page store in the background from pages
+    put() while extraction is still running.
+    """
+
+    _DONE = object()
+
+    def __init__(self, api_key):
+        self.store = None
+        self._api_key = api_key
+        self._embeddings = None
+        self._failed = False
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def put(self, page, text):
+        from langchain.schema import Document
+
+        self._queue.put(Document(page_content=text, metadata={"page": page}))
+
+    def close(self):
+        """Signal that no more pages will be put()."""
+        self._queue.put(self._DONE)
+
+    def result(self):
+        """Wait for the remaining pages to be embedded and return the store (or None)."""
+        self._thread.join()
+        return self.store
+
+    def _run(self):
+        batch = []
+        done = False
+        while not done:
+            item = self._queue.get()
+            if item is self._DONE:
+                done = True
+            else:
+                batch.append(item)
+            if batch and (done or len(batch) >= EMBED_BATCH_PAGES):
+                self._add(batch)
+                batch = []
+
+    def _add(self, docs):
+        from langchain_community.vectorstores import FAISS
+
+        if self._failed:
+            return
+        try:
+            if self._embeddings is None:
+                self._embeddings = get_embeddings(self._api_key)
+            if self.store is None:
+                self.store = FAISS.from_documents(docs, self._embeddings)
+            else:
+                self.store.add_documents(docs)
+        except Exception as e:
+            print(f"FAISS build failed: {e}")
+            self.store = None
+            self._failed = True
+
+
+def run_document_pipeline(pages, static_folder, doc_id=None):
+    """
+    Runs extraction, image analysis and page embedding as overlapping stages:
+
+        extraction --> vision -------+
+                   \\-> embedding ----+--> summary (done by the caller)
+
+    Pages are consumed from the `pages` iterator (see iter_pdf_pages) in the calling
+    thread. Each page's images are queued for the vision scheduler and its text
+    for the embedding stage immediately, so both run while later pages are still
+    being extracted; they are only joined once extraction has finished.
+
+    Args:
+        pages (iterable): Page dicts with 'page', 'text', 'chunks' and 'images'.
+        static_folder (str): Folder the image paths in 'images' are relative to.
+        doc_id (str, optional): Document the vision token usage is recorded under.
+
+    Returns:
+        dict: {'text_chunks': ChunkStore, 'image_info': [...], 'full_text': str,
+               'references': {...}, 'image_summaries': [summary or None per image],
+               'faiss_store': FAISS store or None, 'embedded': whether embedding ran}
+    """
+    api_key = os.getenv("GEMINI_API_KEY")
+
+    text_chunks = ChunkStore()
+    image_info = []
+    full_text_parts = []
+
+    vision = VisionScheduler(partial(process_image_batch, doc_id=doc_id))
+    vision_started = False
+    embedder = PageEmbedder(api_key) if api_key and ALIGNMENT_ENGINE != "bm25" else None
+
+    try:
+        for page in pages:
+            page_num = page["page"]
+            if page["text"]:
+                full_text_parts.append(page["text"])
+
+            chunks = [chunk.strip() for chunk in page["chunks"] if chunk.strip()]
+            for chunk in chunks:
+                text_chunks.append(chunk, page_num)
+            page_text = "\n\n".join(chunks)
+            if embedder and page_text:
+                embedder.put(page_num, page_text)
+
+            for info in page["images"]:
+                # The vision time budget starts with the first image, not with extraction
+                if not vision_started:
+                    vision.start()
+                    vision_started = True
+                vision.submit(len(image_info), os.path.join(static_folder, info["path"]), page_text, info)
+                image_info.append(info)
+    except Exception:
+        vision.cancel()
+        if embedder:
+            embedder.close()
+        raise
+
+    if embedder:
+        embedder.close()
+    full_text = "\n\n".join(full_text_parts)
+    references = extract_references_from_text(full_text)
+
+    # Join the two branches; whichever is slower is the critical path
+    results = vision.wait()
+    image_summaries = [results.get(index) for index in range(len(image_info))]
+    faiss_store = embedder.result() if embedder else None
+
+    return {
+        "text_chunks": text_chunks,
+        "image_info": image_info,
+        "full_text": full_text,
+        "references": references,
+        "image_summaries": image_summaries,
+        "faiss_store": faiss_store,
+        "embedded": embedder is not None,
+    }
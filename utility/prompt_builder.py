@@ -0,0 +1,95 @@
+import re
+
+from utility.rag_processing import find_references_heading
+
+# The bibliography heading must start in this trailing share of the text to be cut;
+# an earlier match is more likely a table of contents than the real bibliography
+REFERENCES_TRAILING_SHARE = 0.5
+
+# Image summaries that only report a failure carry no information for the summary
+_FAILED_INSIGHT_PREFIXES = (
+    "API_LIMIT_EXCEEDED", "Processing error", "Image not found",
+    "No response generated", "Thread error",
+)
+
+_HYPHEN_BREAK_PATTERN = re.compile(r'([a-z])-\n([a-z])')
+_INLINE_WHITESPACE_PATTERN = re.compile(r'[ \t\u00a0]+')
+_LINE_BREAK_PATTERN = re.compile(r'(?<!\n)\n(?!\n)')
+_PARAGRAPH_BREAK_PATTERN = re.compile(r'\n\s*\n')
+_LETTER_PATTERN = re.compile(r'[^\W\d_]')
+
+
+def strip_references_section(text, references):
+    """
+    Drop the bibliography; its entries are parsed separately and only inflate the prompt.
+
+    The text is only cut when `references` (from extract_references_from_text)
+    holds entries, the heading lies in the trailing part of the text and the first
+    entry actually follows it; otherwise the text is returned unchanged.
+    """
+    if not references:
+        return text
+    heading = find_references_heading(text)
+    if heading is None or heading[0] < len(text) * (1 - REFERENCES_TRAILING_SHARE):
+        return text
+
+    first_entry = (references[min(references)].get("full_text") or "")[:40]
+    first_words = " ".join(first_entry.split()[:3])
+    if not first_words or first_words not in _INLINE_WHITESPACE_PATTERN.sub(" ", text[heading[1]:]):
+        return text
+    return text[:heading[0]].rstrip()
+
+
+def _paragraph_key(paragraph):
+    return _INLINE_WHITESPACE_PATTERN.sub(" ", paragraph.lower()).strip()
+
+
+def compact_text(text):
+    """
+    Return the document text with line-break hyphenation undone, wrapped lines
+    joined, whitespace collapsed and repeated or letter-free paragraphs (page
+    numbers, separators, repeated captions) removed.
+    """
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = _HYPHEN_BREAK_PATTERN.sub(r"\1\2", text)
+
+    paragraphs = []
+    seen = set()
+    for paragraph in _PARAGRAPH_BREAK_PATTERN.split(text):
+        paragraph = _INLINE_WHITESPACE_PATTERN.sub(" ", _LINE_BREAK_PATTERN.sub(" ", paragraph)).strip()
+        if not paragraph or not _LETTER_PATTERN.search(paragraph):
+            continue
+        key = _paragraph_key(paragraph)
+        if key in seen:
+            continue
+        seen.add(key)
+        paragraphs.append(paragraph)
+    return "\n\n".join(paragraphs)
+
+
+def compact_insights(image_summary_map):
+    """Return [(page, summary)] in page order without failures and repeated summaries."""
+    insights = []
+    seen = set()
+    for page, summaries in sorted(image_summary_map.items()):
+        for summary in summaries:
+            summary = _INLINE_WHITESPACE_PATTERN.sub(" ", (summary or "").replace("\n", " ")).strip()
+            if not summary or summary.startswith(_FAILED_INSIGHT_PREFIXES):
+                continue
+            key = _paragraph_key(summary)
+            if key in seen:
+                continue
+            seen.add(key)
+            insights.append((page, summary))
+    return insights
+
+
+def build_summary_content(full_text, image_summary_map, references=None):
+    """
+    Build the document content sent for the unified summary: compacted text plus
+    image insights. `references` are the entries parsed from full_text, used to
+    confirm the bibliography before it is left out.
+    """
+    parts = ["TEXT SUMMARY:", compact_text(strip_references_section(full_text, references)), "", "IMAGE INSIGHTS:"]
+    parts.extend(f"- Page {page}: {summary}" for page, summary in compact_insights(image_summary_map))
+    return "\n".join(parts) + "\n"
@@ -1,13 +1,49 @@
 from flask import session
-import fitz  # PyMuPDF
 import os
 from pathlib import Path
 import io
-from PIL import Image
 import uuid
 import re
 
 
+_SENTENCE_SPLIT_PATTERN = re.compile(r'([.!?])\s+')
+
+# An image repeated on at least this many pages and this share of all pages
+# (watermarks, banners, running logos) is treated as boilerplate and skipped
+BOILERPLATE_MIN_PAGES = 3
+BOILERPLATE_PAGE_SHARE = 0.3
+
+# "fast": plain text blocks without image payloads, running headers/footers learned
+# per document; "dict": the full span dictionary with a fixed top/bottom 8% cut
+TEXT_EXTRACTION_MODE = os.getenv("TEXT_EXTRACTION_MODE", "fast").lower()
+# Share of the page height at the top and bottom searched for running headers/footers
+FURNITURE_BAND = 0.12
+# Headers/footers are learned from this many leading pages; later pages stream straight through
+FURNITURE_SAMPLE_PAGES = int(os.getenv("FURNITURE_SAMPLE_PAGES", "12"))
+
+# Charts are rendered at up to CHART_MAX_DPI, lowered per region so that no render
+# exceeds CHART_MAX_PIXELS (but never below CHART_MIN_DPI)
+CHART_MAX_PIXELS = int(os.getenv("CHART_MAX_PIXELS", str(1000 * 1000)))
+CHART_MAX_DPI = 150
+CHART_MIN_DPI = 72
+
+# A line that is nothing but a bibliography heading ("References", "7. Bibliography", ...)
+_REFERENCES_HEADING_PATTERN = re.compile(
+    r'^[ \t]*(?:\d+\.?[ \t]*)?(?:references(?: and notes| cited)?|notes and references|bibliography|works cited|literature cited|reference list)[ \t]*:?[ \t]*$',
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# A bibliography entry starts a line with its number: "12. ", "[12] " or "12) ". The
+# number may also hang on a line of its own, with the entry text on the next line.
+_REFERENCE_ENTRY_PATTERN = re.compile(r'^[ \t]*\[?(\d{1,4})(?:\.|\]|\))\s+', re.MULTILINE)
+_REFERENCE_TAG_PATTERN = re.compile(r'(?:\s*\[(?:CrossRef|PubMed)\])+\s*$')
+# Entries may be skipped (unparseable numbering) but not by more than this
+REFERENCE_MAX_GAP = 5
+
+_DIGITS_PATTERN = re.compile(r'\d+')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
 def _is_potential_logo(bbox, page_width, page_height, max_dim=80, corner_threshold=40):
     """
     Heuristically checks if a bounding box likely contains a logo.
@@ -49,6 +85,8 @@ def _is_potential_logo(bbox, page_width, page_height, max_dim=80, corner_thresho
 
 def _merge_rects(rects, inflation=5):
     """Helper to merge overlapping or nearby rectangles."""
+    import fitz  # PyMuPDF
+
     if not rects:
         return []
     
@@ -75,249 +113,398 @@ def _merge_rects(rects, inflation=5):
     # Shrink back and return
     return [r + (inflation, inflation, -inflation, -inflation) for r in rect_list]
 
-def extract_references_from_text(full_text: str) -> dict[int, dict]:
+def _find_boilerplate_xrefs(doc) -> set[int]:
+    """
+    Count the pages each image xref is placed on, without decoding any image,
+    and return the xrefs repeated often enough to be page furniture.
     """
-    Extracts reference information (journal and year) from the "References" section
-    of the document text. The keys in the dictionary will be the citation numbers.
+    xref_pages = {}
+    for page in doc:
+        for img in page.get_images(full=True):
+            xref_pages.setdefault(img[0], set()).add(page.number)
 
-    Args:
-        full_text (str): The entire text content of the document.
+    min_pages = max(BOILERPLATE_MIN_PAGES, BOILERPLATE_PAGE_SHARE * doc.page_count)
+    return {xref for xref, pages in xref_pages.items() if len(pages) >= min_pages}
 
-    Returns:
-        dict[int, dict]: A dictionary where keys are citation numbers (int) and values
-                         are dictionaries containing 'journal' and 'year'.
-                         Example: {1: {'journal': 'Journal Name', 'year': 'YYYY'}}
+def _furniture_key(line):
+    """Normalise a line so running headers/footers match across pages ("Page 3" == "Page 12")."""
+    return _WHITESPACE_PATTERN.sub(" ", _DIGITS_PATTERN.sub("#", line)).strip().lower()
+
+def _in_furniture_band(block, page_height):
+    return block[3] <= page_height * FURNITURE_BAND or block[1] >= page_height * (1 - FURNITURE_BAND)
+
+def _find_furniture_lines(page_blocks, page_heights) -> set[str]:
     """
-    references = {}
-    
-    # Define a marker for the start of the references section.
-    references_marker = "References"
-    
-    # Find the position of the references marker.
-    start_idx = full_text.find(references_marker)
+    Learn the running headers/footers of a document: lines near the top or bottom
+    of the page whose normalised form repeats on enough pages.
+    """
+    line_pages = {}
+    for page_index, (blocks, height) in enumerate(zip(page_blocks, page_heights)):
+        for block in blocks:
+            if not _in_furniture_band(block, height):
+                continue
+            for line in block[4].splitlines():
+                key = _furniture_key(line)
+                if key:
+                    line_pages.setdefault(key, set()).add(page_index)
+
+    min_pages = max(BOILERPLATE_MIN_PAGES, BOILERPLATE_PAGE_SHARE * len(page_blocks))
+    return {key for key, pages in line_pages.items() if len(pages) >= min_pages}
+
+def _page_text_from_blocks(blocks, page_height, furniture) -> str:
+    """Join the text blocks of a page, dropping learned header/footer lines."""
+    page_text_content = []
+    for block in blocks:
+        lines = [line.strip() for line in block[4].splitlines()]
+        if furniture and _in_furniture_band(block, page_height):
+            lines = [line for line in lines if _furniture_key(line) not in furniture]
+        block_text = "\n".join(line for line in lines if line)
+        if block_text:
+            page_text_content.append(block_text)
+    return "\n\n".join(page_text_content).strip()
+
+def _page_text_from_dict(page) -> str:
+    """Legacy extraction: every span outside a fixed top/bottom 8% band."""
+    page_height = page.rect.height
+
+    # Define header and footer regions (e.g., top/bottom 8% of the page height)
+    header_threshold = page_height * 0.08
+    footer_threshold = page_height * 0.92
+
+    # Extract text blocks with their bounding boxes
+    text_blocks = page.get_text("dict")["blocks"]
+    page_text_content = []
+
+    for b in text_blocks:
+        if b["type"] == 0:  # Text block
+            block_text = []
+            for l in b["lines"]:
+                line_text = []
+                for s in l["spans"]:
+                    # Check if the text span is outside the header and footer regions
+                    x0, y0, x1, y1 = s["bbox"]
+                    if y1 > header_threshold and y0 < footer_threshold:
+                        line_text.append(s["text"])
+                if line_text:
+                    block_text.append(" ".join(line_text))
+
+            if block_text:
+                # Join lines within a block with newlines to preserve structure
+                page_text_content.append("\n".join(block_text))
+
+    # Join blocks with double newlines to create paragraph separations
+    return "\n\n".join(page_text_content).strip()
+
+def iter_page_texts(doc, mode=None):
+    """
+    Yield the text of each page of an open fitz document, in page order.
 
-    if start_idx == -1:
-        return {}
+    In "fast" mode the text blocks of the first FURNITURE_SAMPLE_PAGES pages are
+    read first (a cheap call that skips image payloads) to learn the headers and
+    footers; those pages are then yielded and the remaining pages are extracted
+    and cleaned one at a time, so later stages never wait for a full pass over
+    a long document.
+    """
+    import fitz  # PyMuPDF
 
-    references_section_text = full_text[start_idx + len(references_marker):].strip()
+    mode = mode or TEXT_EXTRACTION_MODE
+    if mode == "dict":
+        for page in doc:
+            yield _page_text_from_dict(page)
+        return
 
-    # Find all reference numbers and their starting positions.
-    matches = list(re.finditer(r"(\d+)\.\s", references_section_text))
+    flags = fitz.TEXTFLAGS_BLOCKS & ~fitz.TEXT_PRESERVE_IMAGES
 
-    for i, match in enumerate(matches):
-        ref_num = int(match.group(1))
-        start_of_ref_text = match.end()
+    def text_blocks(page):
+        # Block type 1 are images; they are excluded by the flags but filtered to be safe
+        return [b for b in page.get_text("blocks", flags=flags) if b[6] == 0]
 
-        if i + 1 < len(matches):
-            # The end of the current reference text is the start of the next reference's number.
-            end_of_ref_text = matches[i+1].start()
-        else:
-            # This is the last reference, so it goes to the end of the section.
-            end_of_ref_text = len(references_section_text)
+    sample_size = min(max(1, FURNITURE_SAMPLE_PAGES), doc.page_count)
+    sample_blocks = []
+    sample_heights = []
+    for page_index in range(sample_size):
+        page = doc[page_index]
+        sample_blocks.append(text_blocks(page))
+        sample_heights.append(page.rect.height)
 
-        # Extract the actual reference text.
-        ref_text = references_section_text[start_of_ref_text:end_of_ref_text].strip()
+    furniture = _find_furniture_lines(sample_blocks, sample_heights)
+    for blocks, height in zip(sample_blocks, sample_heights):
+        yield _page_text_from_blocks(blocks, height, furniture)
 
-        # Remove trailing [CrossRef] or [PubMed] tags and any leading/trailing whitespace
-        ref_text = re.sub(r'\s*\[(?:CrossRef|PubMed)\]\s*$', '', ref_text).strip()
+    for page_index in range(sample_size, doc.page_count):
+        page = doc[page_index]
+        yield _page_text_from_blocks(text_blocks(page), page.rect.height, furniture)
 
-        references[ref_num] = {"full_text": ref_text}
+def _split_long_paragraph(paragraph, max_chunk_len=800):
+    """
+    Yield sentence-aligned pieces of a long paragraph, each at most roughly
+    max_chunk_len characters. Sentences are collected in a list and joined once
+    per piece instead of growing a string.
+    """
+    # Split by periods, exclamation marks, or question marks followed by space or newline
+    parts = _SENTENCE_SPLIT_PATTERN.split(paragraph)
 
-    return references
+    current, current_len = [], 0
+    for i in range(0, len(parts), 2):
+        sentence = parts[i] + parts[i + 1] if i + 1 < len(parts) else parts[i]
+
+        # If adding this sentence would make the chunk too long, emit the current chunk
+        if current and current_len + len(sentence) > max_chunk_len:
+            yield " ".join(current).strip()
+            current, current_len = [sentence], len(sentence)
+        else:
+            current_len += len(sentence) + (1 if current else 0)
+            current.append(sentence)
+
+    if current:
+        last = " ".join(current).strip()
+        if last:
+            yield last
+
+def find_references_heading(full_text: str):
+    """
+    Return the span (start, end) of the bibliography heading, or None.
+
+    Only lines consisting of the heading alone count, so in-text mentions of
+    "references" are ignored; when there are several, the last one is the
+    bibliography (earlier ones tend to be tables of contents or section titles).
+    """
+    last = None
+    for last in _REFERENCES_HEADING_PATTERN.finditer(full_text):
+        pass
+    return last.span() if last else None
 
-def process_pdf_for_rag(pdf_path: str, base_output_dir: str) -> tuple[list[dict], list[dict], str, dict[int, dict]]:
+def extract_references_from_text(full_text: str) -> dict[int, dict]:
     """
-    Extracts text paragraphs and images (including vector-based charts) from a PDF, structured for RAG.
+    Extracts the numbered entries of the bibliography of the document text. The
+    keys in the dictionary will be the citation numbers.
+
+    The bibliography starts at the last line that is only a references heading
+    (see find_references_heading). It is scanned once for entries that start a
+    line with their number ("12. ", "[12] ", "12) "), which may also stand alone
+    on its line; numbers must increase, so numbers inside an entry (volumes,
+    pages) that happen to start a wrapped line are not taken for new entries.
 
     Args:
-        pdf_path (str): Path to the PDF file.
-        base_output_dir (str): Base directory for saving output (e.g., images).
+        full_text (str): The entire text content of the document.
 
     Returns:
-        tuple[list[dict], list[dict], str, dict[int, dict]]: A tuple containing:
-            - A list of text paragraphs, where each element is a dictionary:
-              {'text': 'paragraph text', 'page': page_number}
-            - A list of image information, where each element is a dictionary:
-              {'path': 'relative/path/to/image.png', 'page': page_number}
-            - The full extracted text as a single string.
-            - A dictionary of extracted references, where keys are citation numbers (int) and values
-              are dictionaries containing 'journal' and 'year'.
+        dict[int, dict]: A dictionary where keys are citation numbers (int) and values
+                         are dictionaries containing the entry text.
+                         Example: {1: {'full_text': 'Author. Title. Journal Name. YYYY.'}}
     """
-    doc = fitz.open(pdf_path)
-    
-    images_out_dir = Path(base_output_dir) / "static" / "images"
-    os.makedirs(images_out_dir, exist_ok=True)
+    heading = find_references_heading(full_text)
+    if heading is None:
+        return {}
 
-    text_chunks = []
-    image_info = []
-    full_text = ""
     references = {}
+    ref_num = None
+    start_of_ref_text = None
 
-    for page_num, page in enumerate(doc, start=1):
-        page_width = page.rect.width
-        page_height = page.rect.height
-        
-        # Define header and footer regions (e.g., top/bottom 8% of the page height)
-        header_threshold = page_height * 0.08
-        footer_threshold = page_height * 0.92
-
-        # Extract text blocks with their bounding boxes
-        text_blocks = page.get_text("dict")["blocks"]
-        page_text_content = []
-
-        for b in text_blocks:
-            if b["type"] == 0:  # Text block
-                block_text = []
-                for l in b["lines"]:
-                    line_text = []
-                    for s in l["spans"]:
-                        # Check if the text span is outside the header and footer regions
-                        x0, y0, x1, y1 = s["bbox"]
-                        if y1 > header_threshold and y0 < footer_threshold:
-                            line_text.append(s["text"])
-                    if line_text:
-                        block_text.append(" ".join(line_text))
-                
-                if block_text:
-                    # Join lines within a block with newlines to preserve structure
-                    page_text_content.append("\n".join(block_text))
-        
-        # Join blocks with double newlines to create paragraph separations
-        text = "\n\n".join(page_text_content).strip()
-        if text:
-            full_text += text + "\n\n"
-            
-            # Improved paragraph splitting - split by double newlines and filter meaningful chunks
-            paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
-            
-            for p in paragraphs:
-                # Further split long paragraphs into smaller chunks if they're too long
-                if len(p) > 1000:  # If paragraph is longer than 1000 characters
-                    # Split by sentence endings, but keep sentences together
-                    sentences = []
-                    current_chunk = ""
-                    
-                    # Split by periods, exclamation marks, or question marks followed by space or newline
-                    sentence_endings = re.split(r'([.!?])\s+', p)
-                    
-                    for i in range(0, len(sentence_endings), 2):
-                        if i + 1 < len(sentence_endings):
-                            sentence = sentence_endings[i] + sentence_endings[i + 1]
-                        else:
-                            sentence = sentence_endings[i]
-                        
-                        # If adding this sentence would make the chunk too long, save current chunk
-                        if len(current_chunk) + len(sentence) > 800 and current_chunk:
-                            text_chunks.append({"text": current_chunk.strip(), "page": page_num})
-                            current_chunk = sentence
-                        else:
-                            current_chunk += " " + sentence if current_chunk else sentence
-                    
-                    # Add the last chunk if it has content
-                    if current_chunk.strip():
-                        text_chunks.append({"text": current_chunk.strip(), "page": page_num})
-                else:
-                    # For shorter paragraphs, add as-is but ensure minimum length
-                    if len(p) > 50:  # Only add chunks with meaningful content
-                        text_chunks.append({"text": p, "page": page_num})
-
-        # --- Image and Drawing Extraction ---
-
-        # 1. Extract raster images
-        image_bboxes = []
-        img_list = page.get_images(full=True)
-        for img_index, img in enumerate(img_list):
-            xref = img[0]
-            try:
-                bbox = page.get_image_bbox(img)
-                if not bbox.is_empty:
-                    image_bboxes.append(bbox)
+    for match in _REFERENCE_ENTRY_PATTERN.finditer(full_text, heading[1]):
+        number = int(match.group(1))
+        if ref_num is not None and not ref_num < number <= ref_num + REFERENCE_MAX_GAP:
+            continue
+        if ref_num is not None:
+            references[ref_num] = {"full_text": _clean_reference(full_text[start_of_ref_text:match.start()])}
+        ref_num = number
+        start_of_ref_text = match.end()
 
-                # Check if it's a potential logo before saving
-                if _is_potential_logo(bbox, page.rect.width, page.rect.height):
-                    continue
-                
-                pix = fitz.Pixmap(doc, xref)
-                if pix.alpha:
-                    pix = fitz.Pixmap(fitz.csRGB, pix)
-                
-                img_filename = f"{session.get('user_id')}_page{page_num}_img{img_index + 1}.png"
-                img_path = images_out_dir / img_filename
-                pix.save(str(img_path))
-                
-                web_path = os.path.join("images", img_filename).replace("\\", "/")
-                image_info.append({"path": web_path, "page": page_num})
-            except Exception as e:
-                print(f"Error processing image xref {xref} on page {page_num}: {e}")
-                continue
+    if ref_num is not None:
+        references[ref_num] = {"full_text": _clean_reference(full_text[start_of_ref_text:])}
+
+    return references
+
+def _clean_reference(ref_text: str) -> str:
+    # Join wrapped lines and remove trailing [CrossRef] or [PubMed] tags
+    ref_text = _WHITESPACE_PATTERN.sub(" ", ref_text).strip()
+    return _REFERENCE_TAG_PATTERN.sub("", ref_text).strip()
+
+def _chart_render_dpi(rect) -> float:
+    """Highest DPI up to CHART_MAX_DPI at which rendering `rect` stays within CHART_MAX_PIXELS."""
+    area_sq_inches = (rect.width / 72) * (rect.height / 72)
+    if area_sq_inches <= 0:
+        return CHART_MAX_DPI
+    dpi = (CHART_MAX_PIXELS / area_sq_inches) ** 0.5
+    return max(CHART_MIN_DPI, min(CHART_MAX_DPI, dpi))
+
+def _extract_page_charts(page, page_num, image_bboxes, images_out_dir) -> list[dict]:
+    """Render the vector drawings (charts) of a page to PNGs and return their image info."""
+    import fitz  # PyMuPDF
+    from PIL import Image
+
+    charts = []
+
+    drawings = page.get_drawings()
+    if not drawings:
+        return charts
 
-        # 2. Extract drawings (vector graphics like charts)
-        drawings = page.get_drawings()
-        if not drawings:
+    drawing_rects = [d['rect'] for d in drawings if not d['rect'].is_empty]
+    if not drawing_rects:
+        return charts
+
+    merged_drawing_rects = _merge_rects(drawing_rects)
+
+    # The page content is interpreted once into a display list and every chart is
+    # rendered from it, instead of re-running the content stream for each clip
+    display_list = None
+
+    chart_index = 1
+    for rect in merged_drawing_rects:
+        if rect.is_empty or rect.width < 40 or rect.height < 40:
             continue
-        
-        drawing_rects = [d['rect'] for d in drawings if not d['rect'].is_empty]
-        if not drawing_rects:
+
+        # Check for significant overlap with already extracted raster images
+        is_part_of_existing_image = False
+        for img_bbox in image_bboxes:
+            intersect = rect & img_bbox
+            if not intersect.is_empty:
+                if intersect.get_area() / rect.get_area() > 0.8:
+                    is_part_of_existing_image = True
+                    break
+        if is_part_of_existing_image:
             continue
-            
-        merged_drawing_rects = _merge_rects(drawing_rects)
-        
-        chart_index = 1
-        for rect in merged_drawing_rects:
-            if rect.is_empty or rect.width < 40 or rect.height < 40:
-                continue
-            
-            # Check for significant overlap with already extracted raster images
-            is_part_of_existing_image = False
-            for img_bbox in image_bboxes:
-                intersect = rect & img_bbox
-                if not intersect.is_empty:
-                    if intersect.get_area() / rect.get_area() > 0.8:
-                        is_part_of_existing_image = True
-                        break
-            if is_part_of_existing_image:
-                continue
 
-            # Check if it's a potential logo before saving - more restrictive for drawings
-            if _is_potential_logo(rect, page.rect.width, page.rect.height, max_dim=60, corner_threshold=30):
+        # Check if it's a potential logo before saving - more restrictive for drawings
+        if _is_potential_logo(rect, page.rect.width, page.rect.height, max_dim=60, corner_threshold=30):
+            continue
+
+        # Render the area of the drawing and save as an image
+        try:
+            clip_rect = rect.irect
+            if clip_rect.is_empty: continue
+
+            if display_list is None:
+                display_list = page.get_displaylist()
+            zoom = _chart_render_dpi(clip_rect) / 72
+            pix = display_list.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip_rect)
+            if not pix.width or not pix.height:
                 continue
 
-            # Render the area of the drawing and save as an image
+            # Heuristic to avoid saving blank images using Pillow
             try:
-                clip_rect = rect.irect
-                if clip_rect.is_empty: continue
-                
-                pix = page.get_pixmap(clip=clip_rect, dpi=150)
-                if not pix.width or not pix.height:
+                img_data = pix.tobytes("png")
+                if len(img_data) < 200:  # Small PNGs are often blank or tiny lines
                     continue
 
-                # Heuristic to avoid saving blank images using Pillow
+                img = Image.open(io.BytesIO(img_data))
+
+                colors = img.getcolors(img.width * img.height)
+                if colors:
+                    # If the most dominant color covers > 99.5% of the image, it's likely blank
+                    if (max(c[0] for c in colors) / (img.width * img.height)) > 0.995:
+                        continue
+            except Exception as e:
+                continue
+
+            chart_filename = f"{session.get('user_id')}_page{page_num}_chart{chart_index}.png"
+            chart_path = images_out_dir / chart_filename
+            with open(str(chart_path), "wb") as f:
+                f.write(img_data)
+
+            web_path = os.path.join("images", chart_filename).replace("\\", "/")
+            charts.append({
+                "path": web_path, "page": page_num, "pages": [page_num], "kind": "chart",
+                "area": rect.get_area() / page.rect.get_area(),
+            })
+            chart_index += 1
+        except Exception as e:
+            print(f"Error processing drawing on page {page_num} at rect {rect}: {e}")
+
+    return charts
+
+def iter_pdf_pages(pdf_path: str, base_output_dir: str):
+    """
+    Extracts a PDF page by page, yielding each page as soon as its text and images
+    are available so that later stages can start before the whole document is read.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        base_output_dir (str): Base directory for saving output (e.g., images).
+
+    Yields:
+        dict: {'page': page_number, 'text': 'page text', 'chunks': ['chunk text', ...],
+               'images': [image information dicts first seen on this page]}
+        Each image information dict is
+        {'path': 'relative/path/to/image.png', 'page': page_number,
+         'pages': [every page the image appears on],
+         'kind': 'raster' or 'chart', 'area': share of the page area covered}.
+        Each raster image is listed once; images repeated on many pages are skipped.
+    """
+    import fitz  # PyMuPDF
+
+    images_out_dir = Path(base_output_dir) / "static" / "images"
+    os.makedirs(images_out_dir, exist_ok=True)
+
+    with fitz.open(pdf_path) as doc:
+        # Per-document xref table: each image is decoded and saved once
+        boilerplate_xrefs = _find_boilerplate_xrefs(doc)
+        saved_xrefs = {}
+        page_texts = iter_page_texts(doc)
+
+        for page_num, page in enumerate(doc, start=1):
+            text = next(page_texts)
+            page_chunks = []
+            if text:
+                # Improved paragraph splitting - split by double newlines and filter meaningful chunks
+                paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
+
+                for p in paragraphs:
+                    # Further split long paragraphs into smaller chunks if they're too long
+                    if len(p) > 1000:  # If paragraph is longer than 1000 characters
+                        page_chunks.extend(_split_long_paragraph(p))
+                    else:
+                        # For shorter paragraphs, add as-is but ensure minimum length
+                        if len(p) > 50:  # Only add chunks with meaningful content
+                            page_chunks.append(p)
+
+            # --- Image and Drawing Extraction ---
+
+            # 1. Extract raster images
+            image_bboxes = []
+            page_images = []
+            img_list = page.get_images(full=True)
+            for img_index, img in enumerate(img_list):
+                xref = img[0]
                 try:
-                    img_data = pix.tobytes("png")
-                    if len(img_data) < 200:  # Small PNGs are often blank or tiny lines
+                    bbox = page.get_image_bbox(img)
+                    if not bbox.is_empty:
+                        image_bboxes.append(bbox)
+
+                    if xref in boilerplate_xrefs:
                         continue
 
-                    img = Image.open(io.BytesIO(img_data))
-                    
-                    colors = img.getcolors(img.width * img.height)
-                    if colors:
-                        # If the most dominant color covers > 99.5% of the image, it's likely blank
-                        if (max(c[0] for c in colors) / (img.width * img.height)) > 0.995:
-                            continue
+                    # Already saved from an earlier page: only record where else it appears
+                    if xref in saved_xrefs:
+                        pages = saved_xrefs[xref]["pages"]
+                        if pages[-1] != page_num:
+                            pages.append(page_num)
+                        continue
+
+                    # Check if it's a potential logo before saving
+                    if _is_potential_logo(bbox, page.rect.width, page.rect.height):
+                        continue
+
+                    pix = fitz.Pixmap(doc, xref)
+                    if pix.alpha:
+                        pix = fitz.Pixmap(fitz.csRGB, pix)
+
+                    img_filename = f"{session.get('user_id')}_page{page_num}_img{img_index + 1}.png"
+                    img_path = images_out_dir / img_filename
+                    pix.save(str(img_path))
+
+                    web_path = os.path.join("images", img_filename).replace("\\", "/")
+                    entry = {
+                        "path": web_path, "page": page_num, "pages": [page_num], "kind": "raster",
+                        "area": bbox.get_area() / page.rect.get_area(),
+                    }
+                    saved_xrefs[xref] = entry
+                    page_images.append(entry)
                 except Exception as e:
+                    print(f"Error processing image xref {xref} on page {page_num}: {e}")
                     continue
 
-                chart_filename = f"{session.get('user_id')}_page{page_num}_chart{chart_index}.png"
-                chart_path = images_out_dir / chart_filename
-                with open(str(chart_path), "wb") as f:
-                    f.write(img_data)
-                
-                web_path = os.path.join("images", chart_filename).replace("\\", "/")
-                image_info.append({"path": web_path, "page": page_num})
-                chart_index += 1
-            except Exception as e:
-                print(f"Error processing drawing on page {page_num} at rect {rect}: {e}")
-
-    references = extract_references_from_text(full_text)
+            # 2. Extract drawings (vector graphics like charts)
+            page_images.extend(_extract_page_charts(page, page_num, image_bboxes, images_out_dir))
 
-    return text_chunks, image_info, full_text.strip(), references
+            yield {"page": page_num, "text": text, "chunks": page_chunks, "images": page_images}
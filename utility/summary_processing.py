@@ -1,26 +1,25 @@
 import os
 import re
-import asyncio
 from collections import defaultdict
 
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain.schema import Document
+from utility.gemini_summarize_tool import gemini_summarize, CITATION_PATTERN
+from utility.vector_index import get_embeddings, save_document_index
+from utility.chunk_store import ChunkStore
+from utility.prompt_builder import build_summary_content
 
-from utility.gemini_summarize_tool import gemini_summarize
+# "embedding" aligns paragraphs with remote embeddings + FAISS (falling back to
+# BM25 when the store cannot be built); "bm25" always aligns locally.
+ALIGNMENT_ENGINE = os.getenv("ALIGNMENT_ENGINE", "embedding").strip().lower()
 
 
 def _build_page_text_map(text_chunks):
     """Return page_text_map {page: full text} and page_docs for FAISS."""
-    page_text_map = defaultdict(list)
-    for chunk in text_chunks or []:
-        page = int(chunk.get("page") or 0)
-        txt = (chunk.get("text") or "").strip()
-        if txt:
-            page_text_map[page].append(txt)
+    from langchain.schema import Document
 
-    for p in list(page_text_map.keys()):
-        page_text_map[p] = "\n\n".join(page_text_map[p]).strip()
+    if not isinstance(text_chunks, ChunkStore):
+        text_chunks = ChunkStore.from_chunks(text_chunks or [])
+
+    page_text_map = {page: text_chunks.page_text(page) for page in text_chunks.page_numbers()}
 
     page_docs = [Document(page_content=txt, metadata={"page": page})
                  for page, txt in sorted(page_text_map.items()) if txt]
@@ -28,21 +27,30 @@ def _build_page_text_map(text_chunks):
     return page_text_map, page_docs
 
 
+def _rank_pages(store, para, k=5):
+    """Return candidate pages for a paragraph from either alignment engine, best first."""
+    from utility.lexical_alignment import BM25Index
+
+    if isinstance(store, BM25Index):
+        return store.rank_pages(para, k=k)
+    return [int(m.metadata.get("page", 0) or 0) for m in store.similarity_search(para, k=k)]
+
+
 def _choose_best_page_for_para(store, para, page_to_images, default_page=None):
     """Match paragraph to best page (prefer ones with images)."""
     if store is None:
         return default_page
-    matches = store.similarity_search(para, k=5)
-    if not matches:
+    pages = _rank_pages(store, para, k=5)
+    if not pages:
         return default_page
-    for m in matches:
-        p = int(m.metadata.get("page", 0) or 0)
+    for p in pages:
         if page_to_images.get(p):
             return p
-    return int(matches[0].metadata.get("page", default_page) or (default_page or 0))
+    return pages[0] or (default_page or 0)
 
 
-def summarize_text(full_text, text_chunks, image_info, image_summary_map, references=None):
+def summarize_text(full_text, text_chunks, image_info, image_summary_map, references=None, doc_id=None,
+                   faiss_store=None, embed_pages=True):
     """
     Returns a list of dicts grouped by page:
     [
@@ -54,7 +62,15 @@ def summarize_text(full_text, text_chunks, image_info, image_summary_map, refere
         "type": "unified"
       }
     ]
+
+    When doc_id is given, the page index is persisted for follow-up questions and
+    the token usage of the summary call is recorded under it.
+    A FAISS store already built over the same pages (e.g. by utility.pipeline) can be
+    passed as faiss_store; embed_pages=False skips building one here.
     """
+    from langchain_community.vectorstores import FAISS
+    from utility.lexical_alignment import BM25Index
+
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         return "GEMINI_API_KEY not found."
@@ -62,29 +78,31 @@ def summarize_text(full_text, text_chunks, image_info, image_summary_map, refere
     page_text_map, page_docs = _build_page_text_map(text_chunks)
 
     # Build FAISS store for page alignment
-    store = None
-    if page_docs:
+    if faiss_store is None and embed_pages and page_docs and ALIGNMENT_ENGINE != "bm25":
         try:
-            try:
-                asyncio.get_running_loop()
-            except RuntimeError:
-                asyncio.set_event_loop(asyncio.new_event_loop())
-            embeddings = GoogleGenerativeAIEmbeddings(
-                model="models/embedding-001", google_api_key=api_key
-            )
-            store = FAISS.from_documents(page_docs, embeddings)
+            faiss_store = FAISS.from_documents(page_docs, get_embeddings(api_key))
         except Exception as e:
             print(f"FAISS build failed: {e}")
-            store = None
+            faiss_store = None
 
-    # Combine text + image insights
-    combined_content = f"TEXT SUMMARY:\n{full_text}\n\nIMAGE INSIGHTS:\n"
-    for page, summaries in sorted(image_summary_map.items()):
-        for s in summaries:
-            combined_content += f"- Page {page}: {s}\n"
+    # Keep the index around so follow-up questions skip extraction and embedding;
+    # without a store the page texts alone are kept and embedded on the first question
+    if page_docs and doc_id:
+        try:
+            save_document_index(doc_id, faiss_store, page_docs)
+        except Exception as e:
+            print(f"Saving document index failed: {e}")
+
+    # Align locally when embeddings are disabled or unavailable
+    store = faiss_store
+    if store is None and page_docs:
+        store = BM25Index(page_text_map)
+
+    # Combine text + image insights, without the bibliography, boilerplate and repeats
+    combined_content = build_summary_content(full_text, image_summary_map, references)
 
     # Get unified Gemini summary (≥10 paras)
-    unified_summary = gemini_summarize(combined_content, references=references, min_paragraphs=10)
+    unified_summary = gemini_summarize(combined_content, references=references, min_paragraphs=10, doc_id=doc_id)
     paragraphs = [p.strip() for p in unified_summary.split("\n\n") if p.strip()]
 
     # Map page → images
@@ -157,3 +175,56 @@ def summarize_text(full_text, text_chunks, image_info, image_summary_map, refere
         results[-1]["images"].extend(leftovers)
 
     return results
+
+
+# Longest citation range ("[3-250]") that is expanded into single references
+CITATION_MAX_RANGE = 50
+
+
+def expand_citation_ids(citation):
+    """Turn the inside of a citation ("1", "3-5", "1, 2") into reference numbers."""
+    ids = []
+    for part in citation.split(","):
+        bounds = [b.strip() for b in part.split("-")]
+        if not all(b.isdigit() for b in bounds):
+            continue
+        start, end = int(bounds[0]), int(bounds[-1])
+        if start <= end <= start + CITATION_MAX_RANGE:
+            ids.extend(range(start, end + 1))
+    return ids
+
+
+def build_citation_index(summary, references):
+    """
+    Map every reference cited in the summary to its entry text and to where it is cited:
+
+        {"3": {"full_text": "...", "paragraphs": [0, 4], "pages": ["2", "5"]}}
+
+    Paragraphs are numbered in display order across all summary items; pages are
+    those of the items the citing paragraphs belong to. Only cited references are
+    included, so the index stays small even for long bibliographies.
+    """
+    index = {}
+    if not isinstance(summary, list) or not references:
+        return index
+
+    paragraph_number = 0
+    for item in summary:
+        page = item.get("page")
+        for para in (item.get("response") or "").split("\n\n"):
+            if not para.strip():
+                continue
+            for match in CITATION_PATTERN.finditer(para):
+                for ref_id in expand_citation_ids(match.group(1)):
+                    entry = index.get(str(ref_id))
+                    if entry is None:
+                        ref = references.get(ref_id) or {}
+                        entry = index[str(ref_id)] = {
+                            "full_text": ref.get("full_text"), "paragraphs": [], "pages": [],
+                        }
+                    if paragraph_number not in entry["paragraphs"]:
+                        entry["paragraphs"].append(paragraph_number)
+                    if page and page != "N/A" and page not in entry["pages"]:
+                        entry["pages"].append(page)
+            paragraph_number += 1
+    return index
@@ -0,0 +1,71 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Number of documents whose per-call token usage is kept in memory
+TOKEN_METRICS_MAX_DOCS = int(os.getenv("TOKEN_METRICS_MAX_DOCS", "100"))
+
+_lock = threading.Lock()
+_documents = OrderedDict()
+_totals = {"calls": 0, "input_tokens": 0, "output_tokens": 0, "seconds": 0.0}
+
+
+def _empty_usage():
+    return {"calls": 0, "input_tokens": 0, "output_tokens": 0, "seconds": 0.0, "by_call": {}}
+
+
+def _add(usage, input_tokens, output_tokens, seconds):
+    usage["calls"] += 1
+    usage["input_tokens"] += input_tokens
+    usage["output_tokens"] += output_tokens
+    usage["seconds"] += seconds
+
+
+def record_usage(doc_id, call, response, seconds=0.0):
+    """
+    Record the token usage of one Gemini call.
+
+    Args:
+        doc_id (str or None): Document the call was made for; None counts only towards the totals.
+        call (str): Kind of call, e.g. "summary", "vision" or "answer".
+        response: The generate_content response; its usage_metadata holds the token counts.
+        seconds (float): Wall-clock time of the call.
+    """
+    metadata = getattr(response, "usage_metadata", None)
+    input_tokens = int(getattr(metadata, "prompt_token_count", 0) or 0)
+    output_tokens = int(getattr(metadata, "candidates_token_count", 0) or 0)
+
+    with _lock:
+        _add(_totals, input_tokens, output_tokens, seconds)
+        if not doc_id:
+            return
+        usage = _documents.get(doc_id)
+        if usage is None:
+            usage = _documents[doc_id] = _empty_usage()
+            while len(_documents) > TOKEN_METRICS_MAX_DOCS:
+                _documents.popitem(last=False)
+        _add(usage, input_tokens, output_tokens, seconds)
+        _add(usage["by_call"].setdefault(call, _empty_usage()), input_tokens, output_tokens, seconds)
+
+
+def _copy(usage):
+    copied = dict(usage)
+    copied["seconds"] = round(copied["seconds"], 3)
+    if "by_call" in copied:
+        copied["by_call"] = {call: _copy(u) for call, u in usage["by_call"].items()}
+        for call_usage in copied["by_call"].values():
+            call_usage.pop("by_call", None)
+    return copied
+
+
+def get_document_usage(doc_id):
+    """Token usage recorded for a document, or None if there is none."""
+    with _lock:
+        usage = _documents.get(doc_id)
+        return _copy(usage) if usage is not None else None
+
+
+def get_total_usage():
+    """Token usage of every call made by this process."""
+    with _lock:
+        return _copy(_totals)
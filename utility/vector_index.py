@@ -0,0 +1,227 @@
+import os
+import re
+import json
+import shutil
+import asyncio
+import time
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+INDEX_FOLDER = BASE_DIR / "instance" / "indexes"
+
+# Number of document indexes kept loaded in memory per worker
+INDEX_CACHE_SIZE = int(os.getenv("VECTOR_INDEX_CACHE_SIZE", "8"))
+# Document indexes kept on disk; the least recently written beyond this count, or
+# older than the session lifetime, are removed when a new index is saved (0 = no limit)
+INDEX_MAX_DOCS = int(os.getenv("VECTOR_INDEX_MAX_DOCS", "200"))
+INDEX_MAX_AGE_HOURS = float(os.getenv("VECTOR_INDEX_MAX_AGE_HOURS", "24"))
+# Number of pages retrieved as context for a follow-up question
+QA_TOP_K = int(os.getenv("QA_TOP_K", "4"))
+
+_DOC_ID_PATTERN = re.compile(r"^[0-9a-fA-F\-]{8,64}$")
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_embeddings(api_key=None):
+    """Return the embedding client used for page alignment and retrieval."""
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    api_key = api_key or os.getenv("GEMINI_API_KEY")
+    # The Google embedding client needs an event loop in the calling thread
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        asyncio.set_event_loop(asyncio.new_event_loop())
+    return GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=api_key)
+
+
+def _index_dir(doc_id: str) -> Path:
+    """Resolve the on-disk folder of a document index, rejecting unsafe ids."""
+    if not doc_id or not _DOC_ID_PATTERN.match(doc_id):
+        raise ValueError(f"Invalid document id: {doc_id!r}")
+    return INDEX_FOLDER / doc_id
+
+
+class DocumentIndex:
+    """A loaded per-document FAISS index together with its page texts."""
+
+    def __init__(self, index, pages):
+        self.index = index
+        self.pages = pages
+
+    def search(self, query_vector, k=4):
+        """Return up to k {'page', 'text', 'score'} dicts closest to the query vector."""
+        import numpy as np
+
+        if not self.pages:
+            return []
+        k = min(k, len(self.pages))
+        query = np.asarray([query_vector], dtype=np.float32)
+        distances, ids = self.index.search(query, k)
+        results = []
+        for dist, idx in zip(distances[0], ids[0]):
+            if idx < 0:
+                continue
+            page = self.pages[idx]
+            results.append({"page": page["page"], "text": page["text"], "score": float(dist)})
+        return results
+
+
+def save_document_index(doc_id, store, page_docs):
+    """
+    Persist the FAISS index built for page alignment plus the page texts.
+
+    The vectors are stored in insertion order, so row i of the index belongs
+    to page_docs[i]. With store=None (BM25 alignment, or embedding failed) only
+    the page texts are saved and the index is built on the first question.
+    """
+    import faiss
+
+    index_dir = _index_dir(doc_id)
+    prune_document_indexes(keep=doc_id)
+    os.makedirs(index_dir, exist_ok=True)
+
+    if store is not None:
+        faiss.write_index(store.index, str(index_dir / "index.faiss"))
+    pages = [{"page": doc.metadata.get("page"), "text": doc.page_content} for doc in page_docs]
+    with open(index_dir / "pages.json", "w", encoding="utf-8") as f:
+        json.dump(pages, f)
+
+    with _cache_lock:
+        _cache.pop(doc_id, None)
+
+
+def save_citation_index(doc_id, citation_index):
+    """Persist the citation index of a document (see build_citation_index)."""
+    index_dir = _index_dir(doc_id)
+    prune_document_indexes(keep=doc_id)
+    os.makedirs(index_dir, exist_ok=True)
+    with open(index_dir / "citations.json", "w", encoding="utf-8") as f:
+        json.dump(citation_index, f)
+
+
+def load_citations(doc_id, ref_ids):
+    """
+    Return {ref_id: entry} for the requested reference numbers of a document,
+    or None when the document has no stored citation index.
+    """
+    try:
+        path = _index_dir(doc_id) / "citations.json"
+    except ValueError:
+        return None
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        citation_index = json.load(f)
+    return {str(ref_id): citation_index[str(ref_id)] for ref_id in ref_ids if str(ref_id) in citation_index}
+
+
+def _read_index(path: Path):
+    """Read a FAISS index memory-mapped when the index type allows it."""
+    import faiss
+
+    mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+    try:
+        return faiss.read_index(str(path), mmap_flag)
+    except RuntimeError:
+        return faiss.read_index(str(path))
+
+
+def _build_index(pages, path: Path):
+    """Embed the stored page texts into a new FAISS index and write it to path."""
+    import faiss
+    import numpy as np
+
+    vectors = np.asarray(get_embeddings().embed_documents([page["text"] for page in pages]), dtype=np.float32)
+    # Same index type as the langchain FAISS store built during analysis
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    faiss.write_index(index, str(path))
+    return index
+
+
+def load_document_index(doc_id):
+    """
+    Return the DocumentIndex for doc_id from the LRU cache or disk, or None.
+
+    When only the page texts were stored, the pages are embedded now and the
+    index is saved for later questions.
+    """
+    with _cache_lock:
+        if doc_id in _cache:
+            _cache.move_to_end(doc_id)
+            return _cache[doc_id]
+
+    index_dir = _index_dir(doc_id)
+    index_path = index_dir / "index.faiss"
+    pages_path = index_dir / "pages.json"
+    if not pages_path.exists():
+        return None
+
+    with open(pages_path, "r", encoding="utf-8") as f:
+        pages = json.load(f)
+    if index_path.exists():
+        index = _read_index(index_path)
+    elif pages:
+        index = _build_index(pages, index_path)
+    else:
+        index = None
+    doc_index = DocumentIndex(index, pages)
+
+    with _cache_lock:
+        _cache[doc_id] = doc_index
+        _cache.move_to_end(doc_id)
+        while len(_cache) > INDEX_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return doc_index
+
+
+def delete_document_index(doc_id):
+    """Drop a document index from the cache and remove it from disk."""
+    with _cache_lock:
+        _cache.pop(doc_id, None)
+    try:
+        index_dir = _index_dir(doc_id)
+    except ValueError:
+        return
+    if index_dir.exists():
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+
+def retrieve_pages(doc_id, question, k=QA_TOP_K):
+    """Embed the question and return the top-k pages of a stored document."""
+    doc_index = load_document_index(doc_id)
+    if doc_index is None:
+        return None
+    query_vector = get_embeddings().embed_query(question)
+    return doc_index.search(query_vector, k=k)
+
+
+def prune_document_indexes(keep=None):
+    """
+    Remove stored document indexes beyond INDEX_MAX_DOCS or older than
+    INDEX_MAX_AGE_HOURS, oldest first by last write. The index of doc_id
+    `keep` is never removed.
+    """
+    if not INDEX_FOLDER.exists():
+        return
+    entries = []
+    for path in INDEX_FOLDER.iterdir():
+        if path.name == keep or not path.is_dir():
+            continue
+        try:
+            entries.append((path.stat().st_mtime, path))
+        except OSError:
+            continue
+    entries.sort(reverse=True)
+
+    cutoff = time.time() - INDEX_MAX_AGE_HOURS * 3600 if INDEX_MAX_AGE_HOURS > 0 else None
+    # Leave room for the index of `keep`, which is being written
+    max_others = INDEX_MAX_DOCS - 1 if INDEX_MAX_DOCS > 0 else None
+    for position, (mtime, path) in enumerate(entries):
+        if (max_others is not None and position >= max_others) or (cutoff is not None and mtime < cutoff):
+            delete_document_index(path.name)
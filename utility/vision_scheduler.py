@@ -0,0 +1,229 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+
+# Per-document budget for vision calls; 0 disables the corresponding limit
+VISION_MAX_CALLS = int(os.getenv("VISION_MAX_CALLS", "30"))
+VISION_TIME_BUDGET_SECONDS = float(os.getenv("VISION_TIME_BUDGET_SECONDS", "90"))
+VISION_MAX_WORKERS = int(os.getenv("VISION_MAX_WORKERS", "5"))
+# Images packed into one multimodal request, and the payload cap for such a request
+VISION_BATCH_SIZE = int(os.getenv("VISION_BATCH_SIZE", "4"))
+VISION_BATCH_MAX_BYTES = int(os.getenv("VISION_BATCH_MAX_BYTES", str(8 * 1024 * 1024)))
+# While images are still being submitted, nothing is sent during this window after start()
+VISION_COLLECT_SECONDS = float(os.getenv("VISION_COLLECT_SECONDS", "2"))
+
+# Share of the call budget that may be spent before close(); the rest is kept for
+# images submitted later, which may well be worth more than the early ones
+_EARLY_CALL_SHARE = 0.5
+
+# Pixel count treated as "full size" when an image has no page-area information
+_REFERENCE_PIXELS = 1000 * 1000
+# Page text length at which the text-density term saturates
+_DENSE_PAGE_CHARS = 3000
+
+
+def score_image(image_path, page_text="", meta=None):
+    """
+    Estimate how valuable analysing an image is, in [0, 1].
+
+    Combines the share of the page the image covers (or its pixel size when no
+    page geometry is known), whether it is a rendered vector chart rather than
+    a raster picture, and how much text surrounds it on the page.
+    """
+    meta = meta or {}
+
+    area = meta.get("area")
+    if area is None:
+        from PIL import Image
+
+        try:
+            # Opening only reads the header, the pixels are never decoded
+            with Image.open(image_path) as img:
+                width, height = img.size
+            area = width * height / _REFERENCE_PIXELS
+        except OSError:
+            area = 0.0
+    area = min(max(area, 0.0), 1.0)
+
+    kind_weight = 1.0 if meta.get("kind") == "chart" else 0.6
+    density = min(len(page_text or "") / _DENSE_PAGE_CHARS, 1.0)
+
+    return 0.5 * area + 0.3 * kind_weight + 0.2 * density
+
+
+class VisionScheduler:
+    """
+    Runs vision calls for one document, most valuable images first, within a
+    budget of calls and wall-clock time.
+
+    Images are queued with submit() and picked from a priority heap by a small
+    pool of worker threads once start() has been called. Each worker takes up to
+    batch_size of the best remaining images (within max_batch_bytes of payload)
+    and passes them to analyze_batch as one request, which must return one
+    summary per (image_path, page_text) pair. A None summary from a multi-image
+    request means the batch did not cover that image; it is queued again to be
+    sent on its own, and that request counts against the budget like any other.
+
+    While images are still being submitted, a request is only sent once the
+    collection window after start() has passed and a full batch (batch_size
+    images, or as many as fit in max_batch_bytes) is queued, and only while less
+    than half of the call budget is spent. Images submitted later therefore
+    still compete for the rest of the budget on value; after close() the
+    remaining images are sent best first, in batches of whatever is left.
+    Whatever has not been analysed when the budget runs out is left out of the
+    results.
+    """
+
+    def __init__(self, analyze_batch, max_calls=VISION_MAX_CALLS, time_budget=VISION_TIME_BUDGET_SECONDS,
+                 max_workers=VISION_MAX_WORKERS, batch_size=VISION_BATCH_SIZE,
+                 max_batch_bytes=VISION_BATCH_MAX_BYTES, collect_seconds=VISION_COLLECT_SECONDS):
+        self._analyze_batch = analyze_batch
+        self._max_calls = max_calls
+        self._time_budget = time_budget
+        self._max_workers = max(1, max_workers)
+        self._batch_size = max(1, batch_size)
+        self._max_batch_bytes = max_batch_bytes
+        self._collect_seconds = max(0.0, collect_seconds)
+
+        self._heap = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._calls = 0
+        self._deadline = None
+        self._collect_until = None
+        self._results = {}
+        self._workers = []
+
+    @property
+    def calls(self):
+        """Number of vision requests started so far."""
+        return self._calls
+
+    def submit(self, key, image_path, page_text="", meta=None):
+        """Queue an image; key identifies its summary in the results."""
+        priority = score_image(image_path, page_text, meta)
+        try:
+            payload = os.path.getsize(image_path) + len(page_text or "")
+        except OSError:
+            payload = len(page_text or "")
+        with self._cond:
+            heapq.heappush(self._heap, (-priority, next(self._order), key, image_path, page_text, payload, False))
+            self._cond.notify()
+
+    def start(self):
+        """Start the budget clock and the worker threads."""
+        if self._time_budget and self._time_budget > 0:
+            self._deadline = time.monotonic() + self._time_budget
+        self._collect_until = time.monotonic() + self._collect_seconds
+        for _ in range(self._max_workers):
+            worker = threading.Thread(target=self._work, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def close(self):
+        """Signal that no more images will be submitted."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def cancel(self):
+        """Drop every queued image and stop the workers after their current request."""
+        with self._cond:
+            self._heap.clear()
+            self._closed = True
+            self._cond.notify_all()
+
+    def _remaining(self):
+        if self._deadline is None:
+            return None
+        return self._deadline - time.monotonic()
+
+    def _plan_batch(self):
+        """
+        Return (size, full) for the next request: how many of the best queued images
+        fit in it (the first one always fits), and whether it cannot grow any more.
+        """
+        candidates = heapq.nsmallest(self._batch_size + 1, self._heap)
+        # Images a batch failed to cover are only ever sent on their own
+        if candidates[0][6]:
+            return 1, True
+        size, total = 1, candidates[0][5]
+        for entry in candidates[1:self._batch_size]:
+            if entry[6] or total + entry[5] > self._max_batch_bytes:
+                return size, True
+            size += 1
+            total += entry[5]
+        return size, size >= self._batch_size
+
+    def _may_send_early(self):
+        """Whether a full batch may be sent while images are still being submitted."""
+        if self._collect_until is not None and time.monotonic() < self._collect_until:
+            return False
+        return self._max_calls <= 0 or self._calls < self._max_calls * _EARLY_CALL_SHARE
+
+    def _next_job(self):
+        """Pop the next batch of images, or None once the queue or budget is exhausted."""
+        with self._cond:
+            while True:
+                remaining = self._remaining()
+                if remaining is not None and remaining <= 0:
+                    return None
+                if self._max_calls > 0 and self._calls >= self._max_calls:
+                    return None
+                if self._heap:
+                    size, full = self._plan_batch()
+                    if self._closed or (full and self._may_send_early()):
+                        self._calls += 1
+                        return [heapq.heappop(self._heap) for _ in range(size)]
+                elif self._closed:
+                    return None
+
+                # Wake up for new images, close(), the end of the collection window or the deadline
+                timeout = remaining
+                if self._collect_until is not None:
+                    collecting = self._collect_until - time.monotonic()
+                    if collecting > 0:
+                        timeout = collecting if timeout is None else min(timeout, collecting)
+                self._cond.wait(timeout=timeout)
+
+    def _work(self):
+        while True:
+            batch = self._next_job()
+            if batch is None:
+                return
+            jobs = [(job[3], job[4]) for job in batch]
+            try:
+                summaries = self._analyze_batch(jobs)
+            except Exception as e:
+                print(f"Thread execution failed for {len(jobs)} image(s): {e}")
+                summaries = [f"Thread error: {os.path.basename(path)}" for path, _ in jobs]
+            with self._cond:
+                for job, summary in zip(batch, summaries):
+                    if summary is None and len(batch) > 1:
+                        heapq.heappush(self._heap, job[:6] + (True,))
+                        self._cond.notify()
+                    else:
+                        self._results[job[2]] = summary
+
+    def wait(self):
+        """
+        Wait for the workers (at most until the time budget ends) and return
+        {key: summary} for the images analysed so far.
+        """
+        self.close()
+        for worker in self._workers:
+            remaining = self._remaining()
+            if remaining is not None and remaining <= 0:
+                break
+            worker.join(timeout=remaining)
+
+        with self._cond:
+            skipped = len(self._heap)
+            self._heap.clear()
+            results = dict(self._results)
+        if skipped:
+            print(f"Vision budget reached: {skipped} image(s) left unanalysed")
+        return results